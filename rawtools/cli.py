@@ -15,6 +15,7 @@ from rawtools import log
 from rawtools.constants import KNOWN_FILETYPES
 from rawtools.constants import OUTPUT_BITDEPTHS
 from rawtools.constants import PROJECTION_OPTIONS
+from rawtools.constants import TIFF_COMPRESSIONS
 from rawtools.convert import convert
 from rawtools.utils.path import prune_paths
 
@@ -45,6 +46,10 @@ def __add_convert_options(parser: ArgumentParser):
     parser.add_argument('-F', '--from', metavar='FROM', dest='_from', type=known_filetype, help='input file format')
     parser.add_argument('-T', '--to', type=known_filetype, help='output file format')
     parser.add_argument('-b', '--bit-depth', dest='bitdepth', default='uint8', choices=OUTPUT_BITDEPTHS, help='output bit-depth')
+    parser.add_argument('--compress-level', dest='compress_level', metavar='N', type=int, default=1, choices=range(10), help='zlib compression level of PNG slices and deflate-compressed TIFF stacks (0-9)')
+    parser.add_argument('--tiff-compression', dest='compression', default='tiff_adobe_deflate', choices=TIFF_COMPRESSIONS, help='compression of TIFF slices')
+    parser.add_argument('--progress', action='store_true', help='show a progress bar for each volume')
+    parser.add_argument('--stack', action='store_true', help='write TIFF output as a single multi-page file per volume instead of one file per slice (requires tifffile)')
     parser.add_argument('path', metavar='PATH', nargs='+', help='Input directory to process')
 
 
@@ -56,6 +61,8 @@ def __add_quality_control_options(parser: ArgumentParser):
     image_quality_parser.add_argument('--scale', dest='step', const=100, action='store', nargs='?', default=argparse.SUPPRESS, type=int, help='Add scale on left side of a side projection. Step is the number of slices between each label. (default: 100)')
     image_quality_parser.add_argument('-s', '--slice', dest='index', const=True, nargs='?', type=int, default=argparse.SUPPRESS, help="Extract a slice from volume's side view. (default: floor(x/2))")
     image_quality_parser.add_argument('--font-size', dest='font_size', action='store', type=int, default=24, help='Font size of labels of scale.')
+    image_quality_parser.add_argument('--early-exit', dest='early_exit', action='store_true', default=False, help='Stop reading a volume once its top-down projection is saturated.')
+    image_quality_parser.add_argument('--bits', dest='bits', action='store', type=int, default=8, choices=[8, 16], help='Bit-depth of projections. Floating-point projections are always saved at full precision.')
     image_quality_parser.add_argument('path', metavar='PATH', nargs='+', help='Input directory to process')
 
 
@@ -16,7 +16,7 @@ KNOWN_FILETYPES = dict(
     voxel=VOXEL_FILETYPES,
     volume=VOLUME_FILETYPES,
 )
-KNOWN_FILETYPES_FLAT = list(set(chain.from_iterable(KNOWN_FILETYPES.values())))
+KNOWN_FILETYPES_FLAT = frozenset(chain.from_iterable(KNOWN_FILETYPES.values()))
 RAW_BITDEPTHS = ['uint8', 'uint16', 'float32']
 
 # ==============================================================================
@@ -24,6 +24,7 @@ RAW_BITDEPTHS = ['uint8', 'uint16', 'float32']
 # ==============================================================================
 PROJECTION_OPTIONS = ['side', 'top']
 OUTPUT_BITDEPTHS = ['uint8', 'uint16', 'float32']
+TIFF_COMPRESSIONS = ['raw', 'tiff_lzw', 'tiff_adobe_deflate', 'packbits']
 
 # ==============================================================================
 # Filename Templates & Patterns
@@ -0,0 +1,90 @@
+"""Compiled scaling kernels
+
+Requires numba. The output arrays are pre-allocated by the caller, so each
+kernel makes a single, multi-threaded pass over its input without any
+intermediate arrays.
+"""
+from __future__ import annotations
+
+import math
+
+from numba import njit
+from numba import prange
+
+
+@njit(parallel=True, cache=True)
+def scale_into(src, dst, old_min, old_span, new_span, new_min, lo, hi):
+    """Linearly scale an image into the range of another bit-depth
+
+    Each value goes through the same steps as linear_scale, in the same
+    order, so the scalars must already be of the type it computes in (see
+    utils.scaling_dtype) for the output to be identical to it.
+
+    Args:
+        src (np.ndarray): (y, x) input image
+        dst (np.ndarray): (y, x) output image
+        old_min (float): minimum of input range
+        old_span (float): maximum minus minimum of input range
+        new_span (float): maximum minus minimum of output range
+        new_min (float): minimum of output range, as the same type as the other scalars
+        lo (float): minimum of output range
+        hi (float): maximum of output range
+    """
+    height, width = src.shape
+    for i in prange(height):
+        for j in range(width):
+            v = math.floor((src[i, j] - old_min) / old_span * new_span + new_min)
+            if v < lo:
+                v = lo
+            elif v > hi:
+                v = hi
+            dst[i, j] = v
+
+
+@njit(parallel=True, cache=True)
+def slice_minmax(volume, lows, highs):
+    """Minimum and maximum value of each slice, found in one read of the volume
+
+    Args:
+        volume (np.ndarray): (z, y, x) volume
+        lows (np.ndarray): (z,) output minimum of each slice
+        highs (np.ndarray): (z,) output maximum of each slice
+    """
+    z, y, x = volume.shape
+    for k in prange(z):
+        lo = volume[k, 0, 0]
+        hi = lo
+        for i in range(y):
+            for j in range(x):
+                v = volume[k, i, j]
+                if v < lo:
+                    lo = v
+                elif v > hi:
+                    hi = v
+        lows[k] = lo
+        highs[k] = hi
+
+
+@njit(parallel=True, cache=True)
+def quantize_into(src, dst, lower, span, full_range):
+    """Linearly scale a floating-point image to the full unsigned 16-bit range
+
+    Takes the same float32 steps as linear_scale (see utils.quantize_slice),
+    then clips and truncates.
+
+    Args:
+        src (np.ndarray): (y, x) float32 input image
+        dst (np.ndarray): (y, x) unsigned 16-bit output image
+        lower (float32): minimum of input range
+        span (float32): maximum minus minimum of input range
+        full_range (float32): maximum of output range
+    """
+    height, width = src.shape
+    for i in prange(height):
+        for j in range(width):
+            v = (src[i, j] - lower) / span * full_range
+            if v < 0:
+                v = 0
+            elif v > full_range:
+                v = full_range
+            dst[i, j] = v
@@ -24,6 +24,27 @@ from rawtools import log
 __version__ = version('rawtools')
 
 
+def nonzero_points(files):
+    """Collect the coordinates of all nonzero voxels, one slice at a time
+
+    Points are gathered per slice, so the full volume is never held in
+    memory.
+
+    Args:
+        files (list[str]): filepaths of slices, in order
+
+    Returns:
+        np.ndarray: (N, 3) array of (row, column, slice) indices
+    """
+    points = [np.empty((0, 3), dtype=np.intp)]
+    for idx in track(range(len(files))):
+        img = imread(files[idx]).astype(np.uint8, copy=False)
+        row_indices, column_indices = nonzero(img)
+        slice_indices = np.full_like(row_indices, idx)
+        points.append(np.column_stack((row_indices, column_indices, slice_indices)))
+    return np.concatenate(points)
+
+
 def img2pct(path, format='out', **kwargs):
     parent_path = os.path.dirname(path)
     folder_name = os.path.basename(path)
@@ -53,19 +74,7 @@ def img2pct(path, format='out', **kwargs):
     files = sorted(glob(path + '/*.png'), key=fname2idx)
 
     if format == 'out':
-        for y in track(range(len(files))):
-            img = imread(files[y])
-
-            if y == 0:
-                imgs = np.zeros(
-                    (len(files), img.shape[0], img.shape[1]),
-                    np.uint8,
-                )
-            imgs[y, ...] = img
-
-        indices = nonzero(imgs)
-        indices = np.array(indices)
-        indices = np.transpose(indices)
+        indices = nonzero_points(files)
 
         if dryrun:
             with open(output_fpath, 'wb+') as ifp:
@@ -73,7 +82,7 @@ def img2pct(path, format='out', **kwargs):
                 np.savetxt(ifp, np.array([int(len(indices))]), fmt='%s')
                 np.savetxt(
                     ifp,
-                    indices[..., (1, 2, 0)],
+                    indices,
                     fmt='%s',
                     delimiter=' ',
                 )
@@ -82,19 +91,7 @@ def img2pct(path, format='out', **kwargs):
             logging.info('Dry-run mode. Not generating files.')
 
     elif format == 'obj':
-        for y in track(range(len(files))):
-            img = imread(files[y])
-
-            if y == 0:
-                imgs = np.zeros(
-                    (len(files), img.shape[0], img.shape[1]),
-                    np.uint8,
-                )
-            imgs[y, ...] = img
-
-        indices = nonzero(imgs)
-        indices = np.array(indices)
-        indices = np.transpose(indices)
+        indices = nonzero_points(files)
 
         prefixes = np.array(['v' for _ in indices], dtype='object')
 
@@ -104,7 +101,7 @@ def img2pct(path, format='out', **kwargs):
             with open(output_fpath, 'wb+') as ifp:
                 np.savetxt(
                     ifp,
-                    vertices[..., (0, 2, 3, 1)],
+                    vertices,
                     fmt='%s',
                     delimiter=' ',
                 )
@@ -112,25 +109,13 @@ def img2pct(path, format='out', **kwargs):
         else:
             logging.info('Dry-run mode. Not generating files.')
     elif format == 'xyz':  # meshlab-compatible XYZ file format
-        for y in track(range(len(files))):
-            img = imread(files[y])
-
-            if y == 0:
-                imgs = np.zeros(
-                    (len(files), img.shape[0], img.shape[1]),
-                    np.uint8,
-                )
-            imgs[y, ...] = img
-
-        indices = nonzero(imgs)
-        indices = np.array(indices)
-        indices = np.transpose(indices)
+        indices = nonzero_points(files)
 
         if dryrun:
             with open(output_fpath, 'wb+') as ifp:
                 np.savetxt(
                     ifp,
-                    indices[..., (1, 2, 0)],
+                    indices,
                     fmt='%s',
                     delimiter=' ',
                 )
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import logging
 import os
+import queue
 import sys
 import threading
 from pprint import pformat
@@ -12,6 +13,7 @@ from time import time
 import numpy as np
 import tkinter as tk
 from tkinter import E
+from tkinter import messagebox
 from tkinter import N
 from tkinter import S
 from tkinter import Toplevel
@@ -19,10 +21,12 @@ from tkinter import ttk
 from tkinter import W
 from tqdm import tqdm
 
-from rawtools.convert import scale
 from rawtools.convert.image import nsiefx
+from rawtools.convert.image.utils import open_raw_output
+from rawtools.convert.image.utils import quantize_slice
 from rawtools.gui import nsihdr
 from rawtools.text import dat
+from rawtools.utils.path import scan_tree
 
 # Load in NSI SDK
 currentdir = os.path.dirname(os.path.realpath(__file__))
@@ -30,37 +34,150 @@ rootdir = os.path.dirname(os.path.dirname(currentdir))
 includesdir = os.path.join(rootdir, 'bin')
 sys.path.append(includesdir)
 
-# def check_progress(amount):
-# 	logging.info(amount)
-# 	# progress_text.set(str(round(total_slices_processed / args.total_slice_count * 100.0, 1)))
-# 	progress_text.set(str(total_slices_processed))
-# 	progress['value'] = total_slices_processed
-# 	logging.info(f"{progress_text.get()=}")
 
+def start_progress_thread(args, vol_meta, raw_files, pbar, text, root):
+    """Export volumes in a worker thread and poll its progress from Tk
 
-def update_progress(increment):
-    logging.debug(f'{increment=}')
+    The worker reports the number of processed slices through a queue, which
+    the Tk main loop drains. Once the export is over, the worker puts either
+    `None`, if it finished, or the exception that stopped it.
 
+    Args:
 
-def start_progress_thread(event, pbar, root):
-    global progress_thread
-    progress_thread = threading.Thread(target=update_progress, args=(1,))
+            args (ArgumentParser): user arguments from `argparse`
+            vol_meta (dict): cached metadata per input file
+            raw_files (dict): cached .RAW file names per directory
+            pbar (ttk.Progressbar): progress bar to update
+            text (tk.StringVar): progress percentage label
+            root (tk.Tk): root window
+    """
+    progress_queue: queue.Queue = queue.Queue()
+
+    def export():
+        try:
+            export_volumes(args, vol_meta, raw_files, progress_queue=progress_queue)
+        except Exception as err:
+            progress_queue.put(err)
+        else:
+            progress_queue.put(None)
+
+    progress_thread = threading.Thread(target=export)
     progress_thread.daemon = True
-    # pbar.start()
     progress_thread.start()
-    root.after(20, check_progress_thread(pbar, root))
+    root.after(20, lambda: check_progress_thread(progress_queue, pbar, text, root))
 
 
-def check_progress_thread(pbar, root):
-    if progress_thread.is_alive():
-        logging.info('Pbar is alive')
-        root.after(20, check_progress_thread)
-    else:
+def check_progress_thread(progress_queue, pbar, text, root):
+    """Drain the progress queue and update the progress bar
+
+    Args:
+
+            progress_queue (queue.Queue): progress reported by the export worker
+            pbar (ttk.Progressbar): progress bar to update
+            text (tk.StringVar): progress percentage label
+            root (tk.Tk): root window
+    """
+    done = False
+    error = None
+    increment = 0
+    while True:
+        try:
+            n = progress_queue.get_nowait()
+        except queue.Empty:
+            break
+        if n is None:
+            done = True
+            break
+        if isinstance(n, Exception):
+            error = n
+            break
+        increment += n
+
+    if increment:
+        total = float(pbar['maximum']) or 1.0
+        value = min(float(pbar['value']) + increment, total)
+        pbar['value'] = value
+        text.set(f'{round(value / total * 100.0)}%')
+
+    if error is not None:
+        logging.error(error, exc_info=error)
+        text.set('Failed')
+        pbar.stop()
+        messagebox.showerror('Export failed', str(error), parent=root)
+    elif done:
         logging.info('Pbar is done')
+        text.set('100%')
         pbar.stop()
+    else:
+        root.after(20, lambda: check_progress_thread(progress_queue, pbar, text, root))
+
+
+def find_nsihdr(path):
+    """Recursively find all .NSIHDR files within a directory
+
+    Directories that cannot be read are skipped (see scan_tree).
+
+    Args:
+
+            path (str): directory to search
+
+    Yields:
+            str: filepath to a .NSIHDR file
+    """
+    for entry in scan_tree(path):
+        if entry.is_file() and entry.name.endswith('.nsihdr'):
+            yield entry.path
+
+
+def list_raw_files(directory, cache):
+    """List the names of the .RAW files in a directory
+
+    Each directory is scanned once; subsequent lookups use `cache`.
+
+    Args:
+
+            directory (str): directory to scan
+            cache (dict): mapping of directory to the names of its .RAW files
+
+    Returns:
+            set: names of .RAW files in directory
+    """
+    if directory not in cache:
+        with os.scandir(directory or '.') as it:
+            cache[directory] = {
+                entry.name for entry in it
+                if entry.name.endswith('.raw') and entry.is_file()
+            }
+    return cache[directory]
+
+
+def read_metadata(volume):
+    """Read the metadata of an open NSI volume
+
+    Args:
 
+            volume (nsiefx.efXVolume): open NSI volume
 
-def process(args, fp, export_path):
+    Returns:
+            dict: resolution, bounds, voxel size, and data range of volume
+    """
+    v = volume  # for shorthand laziness
+    return {
+        # resolution (voxels)
+        'width': v.slice_width(),
+        'height': v.slice_height(),
+        'depth': v.num_slices(),
+        # min point (mm), max point (mm), voxel size (mm)
+        'vmin': v.vmin(),
+        'vmax': v.vmax(),
+        'voxel_size': v.voxel_size(),
+        # data min/max voxel values
+        'data_min': v.data_min(),
+        'data_max': v.data_max(),
+    }
+
+
+def process(args, fp, export_path, meta=None, progress_queue=None):
     """Converts NSIHDR files to a single .RAW + .DAT
 
     Args:
@@ -68,6 +185,8 @@ def process(args, fp, export_path):
             args (ArgumentParser): user arguments from `argparse`
             fp (str): filepath to input .NSIHDR file
             export_path (str): filepath to output .RAW file
+            meta (dict): cached metadata from `read_metadata`. If None, it is read from the volume.
+            progress_queue (queue.Queue): queue to put the number of processed slices in, if any
     """
     logging.debug(f'{fp=}')
     total_slices_processed = 0
@@ -75,12 +194,11 @@ def process(args, fp, export_path):
     with nsiefx.open(fp) as volume:
         v = volume  # for shorthand laziness
 
-        # resolution (voxels)
-        width, height, depth = v.slice_width(), v.slice_height(), v.num_slices()
-        # min point (mm), max point (mm), voxel size (mm)
-        vmin, vmax, voxel_size = v.vmin(), v.vmax(), v.voxel_size()
-        # data min/max voxel values
-        data_min, data_max = v.data_min(), v.data_max()
+        if meta is None:
+            meta = read_metadata(v)
+        width, height, depth = meta['width'], meta['height'], meta['depth']
+        vmin, vmax, voxel_size = meta['vmin'], meta['vmax'], meta['voxel_size']
+        data_min, data_max = meta['data_min'], meta['data_max']
         logging.debug(f'Resolution (voxels): {[width, height, depth]}')
         logging.debug(f'Min. point (mm): {vmin}')
         logging.debug(f'Max. point (mm): {vmax}')
@@ -110,52 +228,108 @@ def process(args, fp, export_path):
         logging.debug(f"Generated '{dat_path}'")
 
         pbar = None
-        with open(export_path, 'ab') as raw_ofp:
+        # Report progress in batches of slices to keep tqdm and Tk overhead
+        # negligible relative to decoding
+        progress_interval = max(1, depth // 200)
+        with open_raw_output(export_path) as raw_ofp:
             if not args.verbose:
-                pbar = tqdm(total=depth, desc=f'Exporting {bname}')
+                pbar = tqdm(
+                    total=depth,
+                    desc=f'Exporting {bname}',
+                    mininterval=0.25,
+                    miniters=progress_interval,
+                )
             for n in range(depth):
                 cross_section = v.read_slice(n)
                 cross_section = np.array(cross_section, dtype='float32')
-                cross_section = scale(
+                cross_section = quantize_slice(
                     cross_section,
                     data_min,
                     data_max,
-                    0,
-                    65535,
-                ).astype(np.uint16)
-                cross_section.tofile(raw_ofp)
+                )
+                raw_ofp.write(cross_section)
 
                 total_slices_processed += 1
 
-                if not args.verbose:
-                    pbar.update()
+                if total_slices_processed % progress_interval == 0:
+                    if not args.verbose:
+                        pbar.update(progress_interval)
+                    if progress_queue is not None:
+                        progress_queue.put(progress_interval)
                 # logging.debug(f"Processed {total_slices_processed}")
+            if remainder := total_slices_processed % progress_interval:
+                if not args.verbose:
+                    pbar.update(remainder)
+                if progress_queue is not None:
+                    progress_queue.put(remainder)
             if not args.verbose:
                 pbar.close()
 
 
+def export_volumes(args, vol_meta, raw_files=None, progress_queue=None):
+    """Export each input .NSIHDR to a .RAW
+
+    Args:
+
+            args (ArgumentParser): user arguments from `argparse`
+            vol_meta (dict): cached metadata per input file, if any
+            raw_files (dict): cached .RAW file names per directory, see `list_raw_files`
+            progress_queue (queue.Queue): queue to put the number of processed slices in, if any
+    """
+    if raw_files is None:
+        raw_files = {}
+    # For each provided volume...
+    pbar = None
+    if not args.verbose:
+        pbar = tqdm(total=len(args.files), desc='Overall progress')
+
+    for fp in args.files:
+        logging.debug(f"Processing '{fp}'")
+        dname = os.path.dirname(fp)
+        bname = os.path.basename(os.path.splitext(fp)[0])
+        export_path = os.path.join(dname, f'{bname}.raw')
+        logging.debug(f'{export_path=}')
+        dat_path = os.path.join(dname, f'{bname}.dat')
+        logging.debug(f'{dat_path=}')
+
+        # Determine output location and check for conflicts
+        if f'{bname}.raw' in list_raw_files(dname, raw_files):
+            # If file creation not forced, do not process volume, return
+            if not args.force:
+                logging.info(
+                    f'File already exists. Skipping {export_path}.',
+                )
+                continue
+            # Otherwise, user forced file generation
+            else:
+                logging.warning(
+                    f'FileExistsWarning - {export_path}. File will be overwritten.',
+                )
+
+        # Extract slices and cast to desired datatype
+        process(args, fp, export_path, meta=vol_meta.get(fp), progress_queue=progress_queue)
+
+        if not args.verbose:
+            pbar.update()
+    if not args.verbose:
+        pbar.close()
+
+
 def main(args):
     start_time = time()
 
     try:
-        # Gather all files
-        args.files = []
-        for p in args.path:
-            for root, _, files in os.walk(p):
-                for filename in files:
-                    args.files.append(os.path.join(root, filename))
-
-        # Append any loose, explicitly defined paths to .nsihdr files
-        args.files.extend([f for f in args.path if f.endswith('.nsihdr')])
-
-        # Filter out non-NSIHDR files
-        args.files = [f for f in args.files if f.endswith('.nsihdr')]
-
-        # Get all RAW files
-        logging.debug(f'All files: {pformat(args.files)}')
-        args.files = list(set(args.files))  # remove duplicates
+        # Gather all NSIHDR files, including any loose, explicitly defined
+        # paths to .nsihdr files (duplicates removed)
+        args.files = list({
+            *(fp for p in args.path if os.path.isdir(p) for fp in find_nsihdr(p)),
+            *(p for p in args.path if p.endswith('.nsihdr')),
+        })
         logging.debug(f'Unique files: {pformat(args.files)}')
 
+        # Existing .RAW files, listed once per directory
+        raw_files = {}
+
         # If file overwriting is disabled
         if not args.force:
             kept_volumes = []
@@ -163,8 +337,7 @@ def main(args):
             for fp in args.files:
                 dname = os.path.dirname(fp)
                 bname = os.path.basename(os.path.splitext(fp)[0])
-                export_path = os.path.join(dname, f'{bname}.raw')
-                if os.path.exists(export_path) and os.path.isfile(export_path):
+                if f'{bname}.raw' in list_raw_files(dname, raw_files):
                     skipped_volumes.append(fp)
                 else:
                     kept_volumes.append(fp)
@@ -185,7 +358,7 @@ def main(args):
                 dname = os.path.dirname(fp)
                 bname = os.path.basename(os.path.splitext(fp)[0])
                 export_path = os.path.join(dname, f'{bname}.raw')
-                if os.path.exists(export_path) and os.path.isfile(export_path):
+                if f'{bname}.raw' in list_raw_files(dname, raw_files):
                     existing_volumes.append(export_path)
                 else:
                     unprocessed_volumes.append(export_path)
@@ -202,13 +375,15 @@ def main(args):
         logging.error(err)
         raise err
     else:
+        vol_meta = {}
         # GUI Implementation
         if args.gui:
-            # Determine the number of slices in advance
-            args.total_slice_count = 0
+            # Determine the number of slices in advance, and keep the rest of
+            # the metadata so that it is not read again during processing
             for fp in args.files:
                 with nsiefx.open(fp) as volume:
-                    args.total_slice_count += volume.num_slices()
+                    vol_meta[fp] = read_metadata(volume)
+            args.total_slice_count = sum(m['depth'] for m in vol_meta.values())
 
             # Initialize progress bar
             progress_bar_prompt_title = 'Placeholder Progress Bar'
@@ -232,7 +407,7 @@ def main(args):
             progress = ttk.Progressbar(
                 progress_bar_prompt_frame,
                 orient='horizontal',
-                mode='indeterminate',
+                mode='determinate',
                 length=200,
                 max=args.total_slice_count,
             )
@@ -273,44 +448,10 @@ def main(args):
             progress_bar_prompt.transient(root)
             progress_bar_prompt.wait_visibility()
             progress_bar_prompt.grab_set()
-            progress_bar_prompt.wait_window()
-            start_progress_thread(None, progress, root)
+            start_progress_thread(args, vol_meta, raw_files, progress, progress_text, root)
 
         # CLI Implementation
-        # For each provided volume...
-        pbar = None
-        if not args.verbose:
-            pbar = tqdm(total=len(args.files), desc='Overall progress')
-
-        for fp in args.files:
-            logging.debug(f"Processing '{fp}'")
-            dname = os.path.dirname(fp)
-            bname = os.path.basename(os.path.splitext(fp)[0])
-            export_path = os.path.join(dname, f'{bname}.raw')
-            logging.debug(f'{export_path=}')
-            dat_path = os.path.join(dname, f'{bname}.dat')
-            logging.debug(f'{dat_path=}')
-
-            # Determine output location and check for conflicts
-            if os.path.exists(export_path) and os.path.isfile(export_path):
-                # If file creation not forced, do not process volume, return
-                if not args.force:
-                    logging.info(
-                        f'File already exists. Skipping {export_path}.',
-                    )
-                    continue
-                # Otherwise, user forced file generation
-                else:
-                    logging.warning(
-                        f'FileExistsWarning - {export_path}. File will be overwritten.',
-                    )
-
-            # Extract slices and cast to desired datatype
-            process(args, fp, export_path)
-
-            if not args.verbose:
-                pbar.update()
-        if not args.verbose:
-            pbar.close()
+        else:
+            export_volumes(args, vol_meta, raw_files)
     finally:
         logging.debug(f'Total execution time: {time() - start_time} seconds')
@@ -1,22 +1,130 @@
 from __future__ import annotations
 
 import logging
+import mmap
 import os
+import shutil
+from concurrent.futures import as_completed
+from concurrent.futures import Executor
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from contextlib import nullcontext
 from difflib import get_close_matches
 from functools import cached_property
 from math import prod
+from multiprocessing import cpu_count
 from pathlib import Path
 
 import numpy as np
 from skimage import transform
+from tqdm import tqdm
 
 from rawtools.constants import RAW_BITDEPTHS
-from rawtools.convert.image.utils import array_to_image
+from rawtools.convert.image.utils import image_fpath
+from rawtools.convert.image.utils import save_image
+from rawtools.convert.image.utils import scale_slice
+from rawtools.convert.image.utils import scaling_dtype
+from rawtools.convert.image.utils import TIFFFILE_COMPRESSIONS
 from rawtools.convert.utils import scale
 from rawtools.text import dat
 from rawtools.utils.dataset import Dataset
 from rawtools.utils.path import FilePath
 
+try:
+    from rawtools.convert.image import _kernels
+except ImportError:  # numba is optional; fall back to NumPy
+    _kernels = None  # type: ignore[assignment]
+
+try:
+    import tifffile
+except ImportError:  # tifffile is optional; only needed for TIFF stacks
+    tifffile = None  # type: ignore[assignment]
+
+# Number of bytes reduced at a time when finding the range of a volume
+MINMAX_BLOCK_SIZE = 1 << 20
+# Number of bytes of slices read ahead of the ones being exported
+PREFETCH_SIZE = 1 << 26
+
+
+def _map_file(path: FilePath) -> mmap.mmap:
+    """memory-map a file as read-only
+
+    Args:
+        path (FilePath): filepath
+
+    Returns:
+        mmap.mmap: file contents
+    """
+    with open(path, 'rb') as ifp:
+        mapping = mmap.mmap(ifp.fileno(), 0, access=mmap.ACCESS_READ)
+    # Let the kernel know that the volume is read front to back
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mapping.madvise(mmap.MADV_SEQUENTIAL)
+    return mapping
+
+
+def _prefetch(mapping: mmap.mmap, start: int, length: int):
+    """ask the kernel to start reading a byte range of a mapped file
+
+    Args:
+        mapping (mmap.mmap): mapped file
+        start (int): offset of first byte
+        length (int): number of bytes
+    """
+    if not hasattr(mmap, 'MADV_WILLNEED') or start >= len(mapping):
+        return
+    # The advised range has to start on a page boundary
+    aligned_start = start - start % mmap.PAGESIZE
+    length = min(length + start - aligned_start, len(mapping) - aligned_start)
+    mapping.madvise(mmap.MADV_WILLNEED, aligned_start, length)
+
+
+def _map_volume(path: FilePath, bitdepth: str, shape: tuple[int, int, int]) -> tuple[mmap.mmap, np.ndarray]:
+    """memory-map a volume as a read-only (z, y, x) array
+
+    Slices of the returned array are views, so pages are only read from disk
+    as they are accessed. The file stays mapped for as long as the array or
+    any view of it is referenced, or until it is closed with _unmap.
+
+    Args:
+        path (FilePath): filepath to .raw
+        bitdepth (str): bit-depth of the volume
+        shape (tuple[int, int, int]): dimensions (z, y, x) of the volume
+
+    Raises:
+        ValueError: when the file is smaller than the volume
+
+    Returns:
+        tuple[mmap.mmap, np.ndarray]: mapped file and volume data
+    """
+    expected_size = prod(shape) * np.dtype(bitdepth).itemsize
+    actual_size = os.stat(path).st_size
+    if actual_size < expected_size:
+        raise ValueError(
+            f"Cannot read '{path}'. Volume was expected to be of size '{expected_size}' but was '{actual_size}'. Please check data for corruption.",
+        )
+    mapping = _map_file(path)
+    volume = np.frombuffer(mapping, dtype=bitdepth, count=prod(shape))
+    return mapping, volume.reshape(shape)
+
+
+def _unmap(mapping: mmap.mmap):
+    """close a memory-mapped file
+
+    If an array still refers to the mapping (e.g., from the traceback of an
+    exception), the file is unmapped once that array is garbage-collected
+    instead.
+
+    Args:
+        mapping (mmap.mmap): mapped file
+    """
+    try:
+        mapping.close()
+    except BufferError as e:
+        logging.debug(e)
+
 
 class Raw(Dataset):
     x: int
@@ -58,24 +166,22 @@ class Raw(Dataset):
 
     @cached_property
     def minmax(self) -> tuple[int | float, int | float]:
-        with open(self.path, 'rb') as buffer:
-            chunk_size = self.x * self.y * np.dtype(self.bitdepth).itemsize
-            chunk = np.fromfile(
-                buffer,
-                dtype=self.bitdepth,
-                count=chunk_size,
-            )
-            lowest_found_value = np.min(chunk)
-            greatest_found_value = np.max(chunk)
-            for idx in range(1, self.z):
-                buffer.seek(idx * chunk_size)
-                chunk = np.fromfile(
-                    buffer,
-                    dtype=self.bitdepth,
-                    count=chunk_size,
-                )
-                lowest_found_value = min(lowest_found_value, np.min(chunk))
-                greatest_found_value = max(greatest_found_value, np.max(chunk))
+        volume = self.asarray()
+        if _kernels is not None and volume.dtype.isnative:
+            lows = np.empty(self.z, dtype=volume.dtype)
+            highs = np.empty(self.z, dtype=volume.dtype)
+            _kernels.slice_minmax(volume, lows, highs)
+            return np.min(lows), np.max(highs)
+        # Reduce blocks of rows small enough to still be in cache when they
+        # are read the second time
+        rows = volume.reshape((self.z * self.y, self.x))
+        step = max(1, MINMAX_BLOCK_SIZE // (self.x * volume.itemsize))
+        lowest_found_value = np.min(rows[:step])
+        greatest_found_value = np.max(rows[:step])
+        for start in range(step, len(rows), step):
+            block = rows[start:start + step]
+            lowest_found_value = min(lowest_found_value, np.min(block))
+            greatest_found_value = max(greatest_found_value, np.max(block))
         return lowest_found_value, greatest_found_value
 
     @classmethod
@@ -112,7 +218,23 @@ class Raw(Dataset):
         self.model = self.metadata.model
 
         # Check for invalid data
-        dat.determine_bit_depth(self.path, self.dims)
+        dat.determine_bit_depth(self.path, self.dims, filesize=self.filesize)
+
+    def asarray(self) -> np.ndarray:
+        """volume data as a read-only (z, y, x) array
+
+        The volume is memory-mapped rather than read, so only the slices that
+        are accessed are paged in from disk. The file is unmapped once the
+        array and every view of it are garbage-collected.
+
+        Raises:
+            ValueError: when the .raw is smaller than its .dat describes
+
+        Returns:
+            np.ndarray: volume data
+        """
+        _, volume = _map_volume(self.path, self.bitdepth, (self.z, self.y, self.x))
+        return volume
 
     def __find_dat(self) -> FilePath:
         dpath = os.path.dirname(self.path)
@@ -134,87 +256,235 @@ class Raw(Dataset):
     def __load_metadata(self):
         return dat.read(self.dat_path)
 
-    def to_slices(self, *, ext: str = 'png', bitdepth: str = 'uint8', **kwargs):
+    def _value_bounds(self, bitdepth: str) -> tuple[tuple[int | float, int | float], tuple[int | float, int | float]]:
+        """range of values of this volume and of a target bit-depth
+
+        Args:
+            bitdepth (str): bit-depth of the output
+
+        Returns:
+            tuple[tuple[int | float, int | float], tuple[int | float, int | float]]: lower and upper bounds of input and output values
+        """
+        old_min: int | float
+        old_max: int | float
+        new_min: int | float
+        new_max: int | float
+        # If input bitdepth is an integer, get the max and min with iinfo
+        if np.issubdtype(np.dtype(self.bitdepth), np.integer):
+            old_min = np.iinfo(np.dtype(self.bitdepth)).min
+            old_max = np.iinfo(np.dtype(self.bitdepth)).max
+        # Otherwise, assume float32 input
+        # NOTE: This handles the situation that NSI did not resample the data
+        # before/during conversion from .nsihdr to .raw
+        else:
+            old_min, old_max = self.minmax
+        # If output image bit depth is an integer, get the max and min with
+        # iinfo
+        if np.issubdtype(np.dtype(bitdepth), np.integer):
+            new_min = np.iinfo(np.dtype(bitdepth)).min
+            new_max = np.iinfo(np.dtype(bitdepth)).max
+        # Otherwise, assume float32 output
+        else:
+            new_min = float(np.finfo(np.dtype(bitdepth)).min)
+            new_max = float(np.finfo(np.dtype(bitdepth)).max)
+        return (old_min, old_max), (new_min, new_max)
+
+    def to_slices(self, *, ext: str = 'png', bitdepth: str = 'uint8', executor: Executor | None = None, **kwargs):
         """convert raw to slices (directory)
 
         Args:
             fpath (FilePath): filepath to input .raw
             ext (str, optional): file extension of desired output slices. Defaults to 'png'.
             dtype (str, optional): bit-depth of desired output slices. Defaults to 'uint8'.
+            executor (Executor, optional): thread pool used to write slices, so that one pool can be shared by many volumes. Defaults to None, which creates one for this volume only.
+            progress (bool, optional): show a progress bar on stderr. Defaults to False.
         """
         dryrun = kwargs.get('dryrun', False)
 
-        # Slice attributes
-        img_pixel_count = self.x * self.y
-        img_bytes_count = img_pixel_count * np.dtype(self.bitdepth).itemsize
         logging.debug(f'{bitdepth=}')
         img_bitdepth = bitdepth
         img_basename = os.path.basename(self.path)  # output filename base
         img_filename, _ = os.path.splitext(img_basename)
         img_dirname = os.path.dirname(self.path)
 
-        # Make target directory
-        target_output_directory = Path(img_dirname, img_filename)
+        # Make target directory, unless the user specified a different location
+        target_output_directory = kwargs.get('output_directory', None) or Path(img_dirname, img_filename)
         if not os.path.exists(target_output_directory):
             if not dryrun:
                 os.makedirs(target_output_directory)
 
         # Construct transformation function
-        # If input bitdepth is an integer, get the max and min with iinfo
-        old_min: int | float
-        old_max: int | float
-        new_min: int | float
-        new_max: int | float
-        if np.issubdtype(np.dtype(self.bitdepth), np.integer):
-            old_min = np.iinfo(np.dtype(self.bitdepth)).min
-            old_max = np.iinfo(np.dtype(self.bitdepth)).max
-        # Otherwise, assume float32 input
-        # NOTE: This handles the situation that NSI did not resample the data
-        # before/during conversion from .nsihdr to .raw
-        else:
-            old_min, old_max = self.minmax
-        # If output image bit depth is an integer, get the max and min with
-        # iinfo
-        if np.issubdtype(np.dtype(img_bitdepth), np.integer):
-            new_min = np.iinfo(np.dtype(img_bitdepth)).min
-            new_max = np.iinfo(np.dtype(img_bitdepth)).max
-        # Otherwise, assume float32 output
-        else:
-            new_min = float(np.finfo(np.dtype(img_bitdepth)).min)
-            new_max = float(np.finfo(np.dtype(img_bitdepth)).max)
-
-        # TODO: add multiprocessing
-        # TODO: add progress bar
-
-        # For each slice...
-        with open(self.path, 'rb') as buffer:
-            for idx in range(0, self.z):
-                buffer.seek(idx * img_bytes_count)
-                # Read data
-                chunk = np.fromfile(
-                    buffer,
-                    dtype=self.bitdepth,
-                    count=img_pixel_count,
-                )
-                # Create output target filepath
-                img_fname = os.path.splitext(img_basename)[0]
-                img_fpath = os.path.join(
-                    target_output_directory,
-                    f'{img_fname}_{idx:0{len(str(self.z))}d}.{ext}',
-                )
-                chunk = chunk.reshape((self.y, self.x))
-                # Save image
-                array_to_image(
-                    img_fpath,
-                    chunk,
+        (old_min, old_max), (new_min, new_max) = self._value_bounds(img_bitdepth)
+
+        img_fname = os.path.splitext(img_basename)[0]
+        img_fpaths = [
+            os.path.join(
+                target_output_directory,
+                f'{img_fname}_{idx:0{len(str(self.z))}d}.{ext}',
+            )
+            for idx in range(self.z)
+        ]
+
+        # Skip slices that were already exported, unless the user forced file
+        # creation. Slices are only moved into place once completely written,
+        # so any slice under its final name is complete; it is reused unless
+        # it is empty or older than the volume. The output directory is listed
+        # once instead of checking each slice.
+        # Names of the slices as saved, with the same file extension
+        # save_image uses (e.g., floating-point slices are always TIFFs)
+        img_names = [os.path.basename(image_fpath(img_fpath, img_bitdepth)) for img_fpath in img_fpaths]
+        existing: set[str] = set()
+        if not kwargs.get('force', False) and os.path.isdir(target_output_directory):
+            source_mtime_ns = os.stat(self.path).st_mtime_ns
+            expected_names = set(img_names)
+            with os.scandir(target_output_directory) as it:
+                for entry in it:
+                    if entry.name not in expected_names:
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if st.st_size > 0 and st.st_mtime_ns >= source_mtime_ns:
+                        existing.add(entry.name)
+        tasks = [(idx, img_fpath) for idx, img_fpath in enumerate(img_fpaths) if img_names[idx] not in existing]
+        skipped = [image_fpath(img_fpath, img_bitdepth) for idx, img_fpath in enumerate(img_fpaths) if img_names[idx] in existing]
+        if skipped:
+            logging.info(f"{len(skipped)} of {self.z} slice(s) of '{img_basename}' already exist. Skipping them.")
+            for img_fpath in skipped:
+                logging.debug(f"Skipped '{img_fpath}'.")
+
+        # Slices are scaled here and only the encoding and writing of each
+        # image is handed off to threads; zlib and libtiff release the GIL
+        mapping, volume = _map_volume(self.path, self.bitdepth, (self.z, self.y, self.x))
+        # Slices are exported in contiguous blocks; while one block is being
+        # scaled, the next is already being read from disk
+        slice_size = self.y * self.x * volume.itemsize
+        block_size = max(1, PREFETCH_SIZE // slice_size)
+        buffer = np.empty((self.y, self.x), dtype=scaling_dtype(volume.dtype))
+        threads = kwargs.get('threads', cpu_count())
+        # Limit how many scaled slices can be waiting to be written at once
+        max_pending = 2 * threads
+        # Output arrays of slices that have been written, ready to be reused
+        outputs: list[np.ndarray] = []
+        pending: dict[Future, np.ndarray] = {}
+        next_prefetch = 0
+        # Only pass on the options that writing an image needs; the output
+        # directory is already part of each filepath
+        save_options = {option: kwargs[option] for option in ['dryrun', 'compress_level', 'compression'] if option in kwargs}
+        slice_executor = ThreadPoolExecutor(max_workers=threads) if executor is None else nullcontext(executor)
+        try:
+            with slice_executor as executor, tqdm(total=self.z, initial=len(skipped), desc=f"Exporting '{img_basename}'", disable=not kwargs.get('progress', False)) as pbar:
+                for idx, img_fpath in tasks:
+                    if idx >= next_prefetch:
+                        _prefetch(mapping, (idx + block_size) * slice_size, block_size * slice_size)
+                        next_prefetch = idx + block_size
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                            outputs.append(pending.pop(future))
+                        pbar.update(len(done))
+                    out = outputs.pop() if outputs else np.empty((self.y, self.x), dtype=img_bitdepth)
+                    # Slices that need no scaling are views of the volume, so
+                    # they are not kept past their write
+                    img = scale_slice(
+                        volume[idx],
+                        width=self.x,
+                        height=self.y,
+                        image_bitdepth=img_bitdepth,
+                        old_bounds=(old_min, old_max),
+                        new_bounds=(new_min, new_max),
+                        buffer=buffer,
+                        out=out,
+                    )
+                    pending[executor.submit(save_image, img_fpath, img, img_bitdepth, **save_options)] = out
+                    del img
+                for future in as_completed(pending):
+                    future.result()
+                    pbar.update()
+        finally:
+            del volume
+            _unmap(mapping)
+
+    def to_stack(self, *, bitdepth: str = 'uint8', **kwargs):
+        """convert raw to a single, multi-page TIFF with one page per slice
+
+        Requires tifffile. Pages are written one after another, and the strips
+        of each page are compressed in parallel.
+
+        Args:
+            bitdepth (str, optional): bit-depth of desired output pages. Defaults to 'uint8'.
+            progress (bool, optional): show a progress bar on stderr. Defaults to False.
+        """
+        if tifffile is None:
+            raise ImportError("Writing slices as a single TIFF requires 'tifffile'. Install it or export individual slices instead.")
+
+        dryrun = kwargs.get('dryrun', False)
+        img_basename = os.path.basename(self.path)
+        img_filename, _ = os.path.splitext(img_basename)
+        target_output_directory = kwargs.get('output_directory', None) or os.path.dirname(self.path)
+        stack_fpath = os.path.join(target_output_directory, f'{img_filename}.tif')
+        if os.path.exists(stack_fpath):
+            # If file creation not forced, do not process volume, return
+            if not kwargs.get('force', False):
+                logging.info(f'File already exists. Skipping {stack_fpath}.')
+                return
+            # Otherwise, user forced file generation
+            else:
+                logging.warning(f'FileExistsWarning - {stack_fpath}. File will be overwritten.')
+        if dryrun:
+            return
+        if not os.path.exists(target_output_directory):
+            os.makedirs(target_output_directory)
+
+        old_bounds, new_bounds = self._value_bounds(bitdepth)
+        compression = kwargs.get('compression', 'tiff_adobe_deflate')
+        if compression not in TIFFFILE_COMPRESSIONS:
+            logging.warning(f"'{compression}' is not supported for TIFF stacks. Defaulting to 'tiff_adobe_deflate' instead.")
+            compression = 'tiff_adobe_deflate'
+        tiff_compression = TIFFFILE_COMPRESSIONS[compression]
+        threads = kwargs.get('threads', cpu_count())
+
+        mapping, volume = _map_volume(self.path, self.bitdepth, (self.z, self.y, self.x))
+        buffer = np.empty((self.y, self.x), dtype=scaling_dtype(volume.dtype))
+
+        def pages(volume):
+            for idx in tqdm(range(self.z), desc=f"Exporting '{img_basename}'", disable=not kwargs.get('progress', False)):
+                # tifffile may still hold on to earlier pages, so each page
+                # gets its own output array
+                yield scale_slice(
+                    volume[idx],
                     width=self.x,
                     height=self.y,
-                    image_bitdepth=img_bitdepth,
-                    old_bounds=(old_min, old_max),
-                    new_bounds=(new_min, new_max),
-                    **kwargs,
+                    image_bitdepth=bitdepth,
+                    old_bounds=old_bounds,
+                    new_bounds=new_bounds,
+                    buffer=buffer,
                 )
 
+        try:
+            # Switch to BigTIFF before the uncompressed pages could exceed the
+            # 4 GiB offsets of a classic TIFF
+            bigtiff = self.z * self.y * self.x * np.dtype(bitdepth).itemsize > 2**32 - 2**25
+            with tifffile.TiffWriter(stack_fpath, bigtiff=bigtiff) as tif:
+                tif.write(
+                    pages(volume),
+                    shape=(self.z, self.y, self.x),
+                    dtype=bitdepth,
+                    photometric='minisblack',
+                    compression=tiff_compression,
+                    compressionargs={'level': kwargs.get('compress_level', 1)} if tiff_compression is not None else None,
+                    predictor=tiff_compression is not None and np.issubdtype(np.dtype(bitdepth), np.integer),
+                    # One strip per thread, so that each page is compressed in parallel
+                    rowsperstrip=max(1, -(-self.y // threads)),
+                    maxworkers=threads,
+                )
+        finally:
+            del volume
+            _unmap(mapping)
+        logging.debug(f"'{stack_fpath}' was successfully written.")
+
     def to_raw(self, path: FilePath, *, bitdepth: str | None = 'uint8', shape: tuple[int, int, int] | None = None, **kwargs):
         """convert a .raw to .raw; typically used to change bit depth or scale values
 
@@ -234,10 +504,6 @@ class Raw(Dataset):
 
         dryrun = kwargs.get('dryrun', False)
 
-        # Slice attributes
-        img_pixel_count = self.x * self.y
-        slice_bytes_count = img_pixel_count * np.dtype(self.bitdepth).itemsize
-
         # Target dat filepath
         raw_basename = os.path.basename(path)  # output filename base
         raw_name, _ = os.path.splitext(raw_basename)
@@ -246,71 +512,55 @@ class Raw(Dataset):
         dat_fpath = Path(raw_dirname, dat_filename)
 
         # Construct transformation function
-        # If input bitdepth is an integer, get the max and min with iinfo
-        old_min: int | float
-        old_max: int | float
-        new_min: int | float
-        new_max: int | float
-        if np.issubdtype(np.dtype(self.bitdepth), np.integer):
-            old_min = np.iinfo(np.dtype(self.bitdepth)).min
-            old_max = np.iinfo(np.dtype(self.bitdepth)).max
-        # Otherwise, assume float32 input
-        # NOTE: This handles the situation that NSI did not resample the data
-        # before/during conversion from .nsihdr to .raw
-        else:
-            old_min, old_max = self.minmax
-        # If output image bit depth is an integer, get the max and min with
-        # iinfo
-        if np.issubdtype(np.dtype(bitdepth), np.integer):
-            new_min = np.iinfo(np.dtype(bitdepth)).min
-            new_max = np.iinfo(np.dtype(bitdepth)).max
-        # Otherwise, assume float32 output
-        else:
-            new_min = float(np.finfo(np.dtype(bitdepth)).min)
-            new_max = float(np.finfo(np.dtype(bitdepth)).max)
+        (old_min, old_max), (new_min, new_max) = self._value_bounds(bitdepth)
 
         # When shape is provided, the entire volume must be loaded into memory
         # If not, any interpolation would happen on a slice level and any
         # needed between slices would be lost
         if shape is not None:
-            with open(self.path, 'rb') as ifp:
-                data = np.fromfile(ifp, dtype=self.bitdepth).reshape(self.dims)
-
+            mapping, data = _map_volume(self.path, self.bitdepth, (self.z, self.y, self.x))
+            try:
                 resized_data = transform.resize_local_mean(
-                    data,
+                    data.reshape(self.dims),
                     output_shape=shape,
                     preserve_range=True,
                 ).astype(bitdepth)
-
+            finally:
                 del data
-                logging.debug('Deleted original instance of .raw from main memory')
-                scaled_resized_data = scale(resized_data, old_min, old_max, new_min, new_max).astype(bitdepth)
-                del resized_data
-                logging.debug('Deleted resized instance of .raw from main memory')
-                data_bytes = scaled_resized_data.tobytes()
-                new_thicknesses = tuple([(old / new) * th for old, new, th in zip(self.dims, shape, self.thicknesses)])
-                logging.debug(f'adjusted thicknesses for resized .raw: {new_thicknesses}')
+                _unmap(mapping)
+            logging.debug('Deleted original instance of .raw from main memory')
+            scaled_resized_data = scale(resized_data, old_min, old_max, new_min, new_max).astype(bitdepth)
+            del resized_data
+            logging.debug('Deleted resized instance of .raw from main memory')
+            new_thicknesses = tuple([(old / new) * th for old, new, th in zip(self.dims, shape, self.thicknesses)])
+            logging.debug(f'adjusted thicknesses for resized .raw: {new_thicknesses}')
             # Create new .raw and counterpart .dat files
             if not dryrun:
                 with open(path, 'wb') as ofp:
-                    ofp.write(data_bytes)
+                    # Written straight from the array's buffer, without a copy
+                    ofp.write(scaled_resized_data)
                     dat.write(fpath=dat_fpath, dimensions=shape, thickness=new_thicknesses, dtype=bitdepth, model=self.model)
 
+        # Scaling an integer volume to its own bit-depth leaves every value as
+        # is, so the file is copied as is (by the kernel, where supported)
+        elif bitdepth == self.bitdepth and np.issubdtype(np.dtype(bitdepth), np.integer) and self.filesize == self.expected_filesize:
+            if not dryrun:
+                shutil.copyfile(self.path, path)
+                dat.write(fpath=dat_fpath, dimensions=self.dims, thickness=self.thicknesses, dtype=bitdepth, model=self.model)
+
         else:
             # Load slice
-            with open(self.path, 'rb') as buffer, open(path, 'wb') as ofp:
-                for idx in range(0, self.z):
-                    buffer.seek(idx * slice_bytes_count)
-                    # Read data
-                    chunk = np.fromfile(
-                        buffer,
-                        dtype=self.bitdepth,
-                        count=img_pixel_count,
-                    )
-                    # TODO: Apply scaling if needed
-                    chunk_bytes = scale(chunk, old_min, old_max, new_min, new_max).astype(bitdepth)
-                    if not dryrun:
-                        ofp.write(chunk_bytes)
+            mapping, volume = _map_volume(self.path, self.bitdepth, (self.z, self.y, self.x))
+            try:
+                with open(path, 'wb') as ofp:
+                    for idx in range(self.z):
+                        # TODO: Apply scaling if needed
+                        chunk_bytes = scale(volume[idx], old_min, old_max, new_min, new_max).astype(bitdepth)
+                        if not dryrun:
+                            ofp.write(chunk_bytes)
+            finally:
+                del volume
+                _unmap(mapping)
             # Create counterpart .dat file
             if not dryrun:
                 dat.write(fpath=dat_fpath, dimensions=self.dims, thickness=self.thicknesses, dtype=bitdepth, model=self.model)
@@ -319,9 +569,16 @@ class Raw(Dataset):
 def batch_convert(*data: Raw, ext='png', bitdepth='uint8', **kwargs):
     # TODO: add batch multiprocessing
     # TODO: add progress bar(s)
+    # TO A SINGLE TIFF
+    if kwargs.get('stack', False) and ext.lower() in ['tif', 'tiff']:
+        for sample in data:
+            sample.to_stack(bitdepth=bitdepth, **kwargs)
+        return
     # TO SLICES
-    for sample in data:
-        sample.to_slices(ext=ext, bitdepth=bitdepth, **kwargs)
+    # Share one pool of writer threads across all volumes
+    with ThreadPoolExecutor(max_workers=kwargs.get('threads', cpu_count())) as executor:
+        for sample in data:
+            sample.to_slices(ext=ext, bitdepth=bitdepth, executor=executor, **kwargs)
 
 
 def read_raw(path: FilePath, **kwargs) -> Raw:
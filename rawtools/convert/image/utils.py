@@ -1,13 +1,14 @@
 """Conversion module for RAW data"""
 from __future__ import annotations
 
+import errno
 import logging
+import mmap
 import os
 
 import numpy as np
 from PIL import Image
 
-from rawtools.convert.utils import scale
 from rawtools.utils.path import FilePath
 # from rawtools.utils import dat
 # import os
@@ -15,6 +16,27 @@ from rawtools.utils.path import FilePath
 # from tqdm import tqdm
 # from rawtools.utils.dat import determine_bit_depth
 
+try:
+    from rawtools.convert.image import _kernels
+except ImportError:  # numba is optional; fall back to NumPy
+    _kernels = None  # type: ignore[assignment]
+
+try:
+    import tifffile
+except ImportError:  # tifffile is optional; fall back to Pillow
+    tifffile = None  # type: ignore[assignment]
+
+try:
+    import numexpr as ne  # type: ignore[import-untyped]
+except ImportError:  # numexpr is optional; fall back to NumPy
+    ne = None
+
+# Pillow modes that can be backed by an array's memory as-is
+_SHARED_BUFFER_MODES = {np.dtype('uint8'): 'L', np.dtype('<u2'): 'I;16'}
+
+# Pillow TIFF compression names that tifffile can write without imagecodecs
+TIFFFILE_COMPRESSIONS = {'raw': None, 'tiff_adobe_deflate': 'deflate'}
+
 
 def _infer_image_save_mode(bitdepth: str):
     if bitdepth == 'uint8':
@@ -28,26 +50,188 @@ def _infer_image_save_mode(bitdepth: str):
     return mode
 
 
-def array_to_image(
-    fpath: FilePath,
+def _to_pillow_image(slice: np.ndarray) -> Image.Image:
+    """wrap a 2-D array as a Pillow image
+
+    8-bit and little-endian 16-bit images share the array's memory instead of
+    copying it.
+
+    Args:
+        slice (np.ndarray): (height, width) data
+
+    Returns:
+        Image.Image: image
+    """
+    mode = _SHARED_BUFFER_MODES.get(slice.dtype)
+    if mode is None:
+        return Image.fromarray(slice)
+    slice = np.ascontiguousarray(slice)
+    height, width = slice.shape
+    return Image.frombuffer(mode, (width, height), slice, 'raw', mode, 0, 1)
+
+
+def scaling_dtype(dtype: np.dtype | str) -> np.dtype:
+    """floating-point type that values of a given type are scaled in
+
+    This is the type that linear_scale computes in: integers are promoted to
+    float64, while floating-point values keep their own precision.
+
+    Args:
+        dtype (np.dtype | str): type of the values to be scaled
+
+    Returns:
+        np.dtype: floating-point type
+    """
+    return np.result_type(np.dtype(dtype), 1.0)
+
+
+def scale_slice(
     arr: np.ndarray,
     width: int,
     height: int,
     image_bitdepth: str,
     old_bounds: tuple,
     new_bounds: tuple,
+    buffer: np.ndarray | None = None,
+    out: np.ndarray | None = None,
     **kwargs,
-):
-    """save numpy array as image
+) -> np.ndarray:
+    """rescale a numpy array to the value range of the output image
+
+    The output is identical to flooring linear_scale and casting the result
+    to image_bitdepth.
 
     Args:
-        fpath (FilePath): destination filepath
         arr (np.ndarray): data
         width (int): width of output image
         height (int): height of output image
         image_bitdepth (str): bitdepth of output image
         old_bounds (tuple): lower and upper bounds for possible values for each pixel of input array
         new_bounds (tuple): lower and upper bounds for possible value for each pixel of output image
+        buffer (np.ndarray, optional): scratch array of shape (height, width), reused between calls to avoid allocating one per image. Only used if its type is scaling_dtype(arr.dtype). Defaults to None.
+        out (np.ndarray, optional): image_bitdepth array of shape (height, width) to write the scaled values to. Defaults to None.
+
+    Returns:
+        np.ndarray: (height, width) array of image_bitdepth values; out, if the values had to be scaled. Never a view of buffer.
+    """
+    slice = arr.reshape((height, width))
+
+    old_min, old_max = old_bounds
+    new_min, new_max = new_bounds
+
+    if arr.dtype != np.dtype(image_bitdepth):
+        if out is None:
+            out = np.empty((height, width), dtype=image_bitdepth)
+        # Between full unsigned integer ranges that are multiples of each
+        # other (e.g., uint16 to uint8 is a division by 257), every scaled
+        # value is an exact integer, so no floating-point values are needed
+        integer_scaling = all([
+            np.issubdtype(slice.dtype, np.unsignedinteger),
+            np.issubdtype(out.dtype, np.unsignedinteger),
+            old_min == new_min == 0,
+            np.issubdtype(slice.dtype, np.integer) and old_max == np.iinfo(slice.dtype).max,
+        ])
+        if integer_scaling and old_max % new_max == 0:
+            np.floor_divide(slice, old_max // new_max, out=out, dtype=slice.dtype, casting='unsafe')
+        elif integer_scaling and new_max % old_max == 0:
+            np.multiply(slice, new_max // old_max, out=out, dtype=out.dtype, casting='unsafe')
+        else:
+            # Take the same steps as linear_scale, in the type it computes in;
+            # folding them into a single gain and bias rounds differently, and
+            # float32 intermediates overflow for float32 outputs
+            work_dtype = scaling_dtype(slice.dtype)
+            old_min_value = work_dtype.type(old_min)
+            old_span = work_dtype.type(old_max - old_min)
+            new_span = work_dtype.type(new_max - new_min)
+            new_min_value = work_dtype.type(new_min)
+            if _kernels is not None and np.issubdtype(out.dtype, np.integer):
+                _kernels.scale_into(slice, out, old_min_value, old_span, new_span, new_min_value, new_min, new_max)
+            else:
+                if buffer is None or buffer.dtype != work_dtype:
+                    buffer = np.empty((height, width), dtype=work_dtype)
+                np.subtract(slice, old_min_value, out=buffer, dtype=work_dtype)
+                np.divide(buffer, old_span, out=buffer)
+                np.multiply(buffer, new_span, out=buffer)
+                np.add(buffer, new_min_value, out=buffer)
+                np.floor(buffer, out=buffer)  # TODO: is this still necessary?
+                np.clip(buffer, new_min, new_max, out=buffer)
+                np.copyto(out, buffer, casting='unsafe')
+        slice = out
+
+    return slice
+
+
+def quantize_slice(cross_section: np.ndarray, data_min: float, data_max: float) -> np.ndarray:
+    """Linearly scale a floating-point slice to the full unsigned 16-bit range
+
+    The values are the same as casting linear_scale to uint16, and values
+    outside of [data_min, data_max] are clipped. When numba is installed, the
+    scale, clip, and cast are fused into one compiled, multi-threaded loop.
+    Otherwise, numexpr (if installed) evaluates the scale without NumPy's
+    chain of temporary arrays.
+
+    Args:
+        cross_section (np.ndarray): float32 slice
+        data_min (float): minimum voxel value of volume
+        data_max (float): maximum voxel value of volume
+
+    Returns:
+        np.ndarray: unsigned 16-bit slice
+    """
+    # linear_scale computes in float32 for a float32 slice; the scalars are
+    # rounded to float32 the same way
+    lower = np.float32(data_min)
+    span = np.float32(data_max - data_min)
+    full_range = np.float32(65535)
+    if _kernels is not None:
+        quantized = np.empty(cross_section.shape, dtype=np.uint16)
+        _kernels.quantize_into(cross_section, quantized, lower, span, full_range)
+        return quantized
+    if ne is not None:
+        scaled = ne.evaluate(
+            '(src - lower) / span * full_range',
+            local_dict={'src': cross_section, 'lower': lower, 'span': span, 'full_range': full_range},
+        )
+    else:
+        scaled = cross_section - lower
+        scaled /= span
+        scaled *= full_range
+    np.clip(scaled, 0, 65535, out=scaled)
+    return scaled.astype(np.uint16)
+
+
+def image_fpath(fpath: FilePath, image_bitdepth: str) -> str:
+    """filepath that save_image writes an image to
+
+    Floating-point images can only be saved as TIFF, so any other file
+    extension is replaced with '.tif'.
+
+    Args:
+        fpath (FilePath): requested filepath
+        image_bitdepth (str): bitdepth of output image
+
+    Returns:
+        str: filepath of saved image
+    """
+    target_fpath = str(fpath)
+    target_fname, target_ext = os.path.splitext(target_fpath)
+    if 'float' in image_bitdepth and 'tif' not in target_ext:
+        return f'{target_fname}.tif'
+    return target_fpath
+
+
+def save_image(fpath: FilePath, slice: np.ndarray, image_bitdepth: str, **kwargs):
+    """save an already scaled numpy array as image
+
+    Encoding is done by zlib/libtiff, which release the GIL, so this may be
+    called from several threads at once.
+
+    Args:
+        fpath (FilePath): destination filepath
+        slice (np.ndarray): (height, width) data, as returned by scale_slice
+        image_bitdepth (str): bitdepth of output image
+        compress_level (int, optional): zlib compression level of PNG images. Defaults to 1.
+        compression (str, optional): compression of TIFF images, in Pillow's naming (e.g., 'tiff_lzw', 'raw'). Defaults to 'tiff_adobe_deflate'. Uncompressed and deflate TIFFs are written with tifffile when it is installed.
     """
     dryrun = kwargs.get('dryrun', False)
 
@@ -56,32 +240,67 @@ def array_to_image(
         bname = os.path.basename(fpath)
         adjusted_fpath = os.path.join(output_directory, bname)
         if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
+            os.makedirs(output_directory, exist_ok=True)
         fpath = adjusted_fpath
 
-    slice = arr.reshape((height, width))
-
-    old_min, old_max = old_bounds
-    new_min, new_max = new_bounds
-
-    if arr.dtype != np.dtype(image_bitdepth):
-        slice = scale(slice, old_min, old_max, new_min, new_max)
-        slice = np.floor(slice)  # TODO: is this still necessary?
-        slice = slice.astype(image_bitdepth)
-
     if not dryrun:
-        target_fpath = str(fpath)
+        target_fpath = image_fpath(fpath, image_bitdepth)
+        if target_fpath != str(fpath):
+            logging.warning("PNG does not support 32-bit float bit-depth. Defaulting to 'tif' file extension instead.")
         target_fname, target_ext = os.path.splitext(target_fpath)
         image_mode = _infer_image_save_mode(image_bitdepth)
-        if 'float' in image_bitdepth and 'tif' not in target_ext:
-            logging.warning("PNG does not support 32-bit float bit-depth. Defaulting to 'tif' file extension instead.")
-            target_ext = 'tif'
-            target_fpath = f'{target_fname}.tif'
-        img = Image.fromarray(slice)
-        img.save(target_fpath, mode=image_mode)
+        # Write to a temporary file first and only move it into place once it
+        # is complete, so an interrupted export never leaves a truncated image
+        # behind under its final name
+        partial_fpath = f'{target_fname}.partial{target_ext}'
+        if 'tif' in target_ext.lower():
+            compression = kwargs.get('compression', 'tiff_adobe_deflate')
+            if tifffile is not None and compression in TIFFFILE_COMPRESSIONS:
+                # Write straight from the array, without a PIL Image in between
+                tiff_compression = TIFFFILE_COMPRESSIONS[compression]
+                tifffile.imwrite(
+                    partial_fpath,
+                    slice,
+                    photometric='minisblack',
+                    compression=tiff_compression,
+                    # Horizontal differencing only applies to integer data
+                    predictor=tiff_compression is not None and np.issubdtype(slice.dtype, np.integer),
+                )
+            else:
+                _to_pillow_image(slice).save(partial_fpath, mode=image_mode, compression=compression)
+        else:
+            _to_pillow_image(slice).save(partial_fpath, mode=image_mode, compress_level=kwargs.get('compress_level', 1))
+        os.replace(partial_fpath, target_fpath)
         logging.debug(f"'{fpath}' was successfully written.")
 
 
+def array_to_image(
+    fpath: FilePath,
+    arr: np.ndarray,
+    width: int,
+    height: int,
+    image_bitdepth: str,
+    old_bounds: tuple,
+    new_bounds: tuple,
+    buffer: np.ndarray | None = None,
+    **kwargs,
+):
+    """save numpy array as image
+
+    Args:
+        fpath (FilePath): destination filepath
+        arr (np.ndarray): data
+        width (int): width of output image
+        height (int): height of output image
+        image_bitdepth (str): bitdepth of output image
+        old_bounds (tuple): lower and upper bounds for possible values for each pixel of input array
+        new_bounds (tuple): lower and upper bounds for possible value for each pixel of output image
+        buffer (np.ndarray, optional): scratch array of shape (height, width), reused between calls to avoid allocating one per image (see scale_slice). Defaults to None.
+    """
+    slice = scale_slice(arr, width, height, image_bitdepth, old_bounds, new_bounds, buffer=buffer)
+    save_image(fpath, slice, image_bitdepth, **kwargs)
+
+
 # def main(args):
 #     start_time = time()
 
@@ -268,3 +487,117 @@ def array_to_image(
 #         dtype=file_format,
 #         model=d['model'],
 #     )
+
+
+class DirectWriter:
+    """Write-once output file that bypasses the page cache (Linux only)
+
+    Data is staged in a page-aligned buffer and flushed in whole blocks, as
+    required by `O_DIRECT`. The final partial block is padded for the write
+    and the file is truncated back to its true size on close. If the file
+    system rejects a direct write, the file is reopened without `O_DIRECT`
+    and written to as usual from then on.
+
+    Args:
+        path (FilePath): filepath to output file
+        buffer_size (int, optional): size of the staging buffer in bytes. Defaults to 4 MiB.
+    """
+    block_size = 4096
+
+    def __init__(self, path: FilePath, buffer_size: int = 4 << 20):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_DIRECT, 0o644)
+        self.direct = True
+        self.buffer_size = max(self.block_size, buffer_size - buffer_size % self.block_size)
+        self.buffer = mmap.mmap(-1, self.buffer_size)  # page-aligned
+        self.view = memoryview(self.buffer)
+        self.staged = 0  # bytes in buffer
+        self.written = 0  # bytes in file
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        while len(data) > 0:
+            n = min(len(data), self.buffer_size - self.staged)
+            self.view[self.staged:self.staged + n] = data[:n]
+            self.staged += n
+            data = data[n:]
+            if self.staged == self.buffer_size:
+                self._flush(self.staged)
+
+    def _flush(self, nbytes: int):
+        aligned = nbytes - nbytes % self.block_size
+        if aligned:
+            self._write(self.view[:aligned])
+            self.written += aligned
+        remainder = nbytes - aligned
+        self.view[:remainder] = self.view[aligned:nbytes]
+        self.staged = remainder
+
+    def _write(self, data: memoryview):
+        while len(data) > 0:
+            try:
+                n = os.write(self.fd, data)
+            except OSError as err:
+                # Some file systems accept O_DIRECT when a file is opened, but
+                # not when it is written to
+                if err.errno != errno.EINVAL or not self.direct:
+                    raise
+                logging.debug(f"O_DIRECT not supported for '{self.path}'. Using buffered output.")
+                os.close(self.fd)
+                self.fd = os.open(self.path, os.O_WRONLY)
+                os.lseek(self.fd, self.written, os.SEEK_SET)
+                self.direct = False
+                continue
+            data = data[n:]
+
+    def close(self):
+        if self.fd is None:
+            return
+        try:
+            if self.staged:
+                # Pad to a whole block, then drop the padding
+                size = self.written + self.staged
+                padded = -(-self.staged // self.block_size) * self.block_size
+                self.view[self.staged:padded] = bytes(padded - self.staged)
+                self._flush(padded)
+                os.ftruncate(self.fd, size)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+            self.view.release()
+            try:
+                self.buffer.close()
+            except BufferError as e:
+                # A view of the buffer is still referenced by the traceback
+                # of a failed write; the buffer is freed along with it
+                logging.debug(e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_raw_output(path: FilePath):
+    """Open a .RAW for writing, bypassing the page cache when supported
+
+    The .RAW is written once and never re-read, so caching it only evicts
+    more useful pages. Falls back to a regular buffered file when
+    `O_DIRECT` is unavailable (e.g., Windows, tmpfs) or the file already
+    has content.
+
+    Args:
+        path (FilePath): filepath to output .RAW file
+
+    Returns:
+        file-like object with `write` and `close`
+    """
+    if hasattr(os, 'O_DIRECT') and not os.path.exists(path):
+        try:
+            return DirectWriter(path)
+        except OSError as err:
+            if err.errno != errno.EINVAL:
+                raise
+            logging.debug(f"O_DIRECT not supported for '{path}'. Using buffered output.")
+    return open(path, 'ab', buffering=4 << 20)
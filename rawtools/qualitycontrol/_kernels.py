@@ -0,0 +1,61 @@
+"""Compiled projection kernels
+
+Requires numba. The arrays are pre-allocated by the caller and no NumPy
+functions are called inside of the kernels, so each loop compiles down to
+a tight, multi-threaded reduction over a (z, y, x) volume.
+"""
+from __future__ import annotations
+
+from numba import njit
+from numba import prange
+from numba import set_num_threads as _set_num_threads
+
+
+def set_num_threads(n):
+    """Limit the number of threads used by the parallel kernels
+
+    Args:
+        n (int): number of threads
+    """
+    _set_num_threads(n)
+
+
+@njit(parallel=True, cache=True)
+def side_project(volume, out):
+    """Maximum value along the y-axis of each slice
+
+    Args:
+        volume (np.ndarray): (z, y, x) volume
+        out (np.ndarray): (z, x) output projection
+    """
+    z, y, x = volume.shape
+    for k in prange(z):
+        row = out[k]
+        for j in range(x):
+            row[j] = volume[k, 0, j]
+        # Walk each slice row by row so the inner loop is contiguous
+        for i in range(1, y):
+            for j in range(x):
+                v = volume[k, i, j]
+                if v > row[j]:
+                    row[j] = v
+
+
+@njit(parallel=True, cache=True)
+def top_project(volume, out):
+    """Maximum value along the z-axis of a volume
+
+    Args:
+        volume (np.ndarray): (z, y, x) volume
+        out (np.ndarray): (y, x) output projection
+    """
+    z, y, x = volume.shape
+    for i in prange(y):
+        row = out[i]
+        for j in range(x):
+            row[j] = volume[0, i, j]
+        for k in range(1, z):
+            for j in range(x):
+                v = volume[k, i, j]
+                if v > row[j]:
+                    row[j] = v
@@ -20,6 +20,11 @@ The input data consists of a `.raw` and its paired `.dat` file. Both of these
 can be generated either by the NorthStar Imaging (NSI) Software from exporting a
 `.raw` volume.
 
+A `.raw` volume is read as a C-ordered `(z, y, x)` array, where `z` is the
+number of horizontal slices and `x` varies fastest on disk. Projections are
+reduced across whole rows of `x` values at a time, so every inner loop reads
+memory contiguously without first transposing the volume.
+
 ### Output
 
 The output consists of 2 types of files.
@@ -34,8 +39,9 @@ The output consists of 2 types of files.
 ## Usage
 
 ```txt
-usage: qc-raw [-h] [-v] [-V] [-f] [--si] [-p PROJECTION [PROJECTION ...]]
+usage: qc-raw [-h] [-v] [-V] [-f] [-t N] [--si] [-p PROJECTION [PROJECTION ...]]
                  [--scale [STEP]] [-s [INDEX]] [--font-size FONT_SIZE]
+                 [--early-exit] [--bits {8,16}]
                  PATHS [PATHS ...]
 
 Check the quality of a .RAW volume by extracting a slice or generating a
@@ -51,6 +57,8 @@ optional arguments:
   -V, --version         show program's version number and exit
   -f, --force           Force file creation. Overwrite any existing files.
                         (default: False)
+  -t N, --threads N     Specify upper limit for number of threads used during
+                        processing (default: number of CPUs)
   --si                  Print human readable sizes (e.g., 1 K, 234 M, 2 G)
                         (default: False)
   -p PROJECTION [PROJECTION ...], --projection PROJECTION [PROJECTION ...]
@@ -65,6 +73,10 @@ optional arguments:
                         floor(x/2))
   --font-size FONT_SIZE
                         Font size of labels of scale. (default: 24)
+  --early-exit          Stop reading a volume once its top-down projection is
+                        saturated. (default: False)
+  --bits {8,16}         Bit-depth of projections. Floating-point projections
+                        are always saved at full precision. (default: 8)
 ```
 
 ### Single project conversion
@@ -109,22 +121,33 @@ import argparse
 import logging
 import math
 import os
+import stat
 import sys
+from concurrent.futures import as_completed
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
 from PIL import Image
 from PIL import ImageDraw
 from PIL import ImageFont
-from PIL import ImageMath
 from tqdm import tqdm
 
 from rawtools import __version__
 from rawtools.text import dat
 from rawtools.text.dat import bitdepth_from_format
+from rawtools.utils.path import scan_tree
 # from rawtools import log
 
-font = None
+try:
+    from rawtools.qualitycontrol import _kernels
+except ImportError:  # numba is optional; fall back to NumPy
+    _kernels = None  # type: ignore[assignment]
+
+# Number of slices reduced at once when generating projections
+SLICES_PER_CHUNK = 64
 
 
 def rawfp2datfp(fp):
@@ -133,6 +156,46 @@ def rawfp2datfp(fp):
     return os.path.join(directory, f'{name}.dat')
 
 
+def has_dat(fp):
+    """Check that a .RAW volume has a .DAT file next to it
+
+    The .DAT is only looked up here, with a single stat. It is parsed once it
+    is needed to process the volume.
+
+    Args:
+      fp (str): filepath for a .RAW volume
+
+    Returns:
+      bool: True if the .DAT exists and is a regular file
+    """
+    dat_filename = os.path.splitext(fp)[0] + '.dat'
+    try:
+        st = os.stat(dat_filename)
+    except OSError:
+        logging.warning(f"Missing '.dat' file: '{dat_filename}'")
+        return False
+    if not stat.S_ISREG(st.st_mode):
+        logging.warning(f"Provided '.dat' is not a file: '{dat_filename}'")
+        return False
+    return True
+
+
+def iter_raw(path):
+    """Recursively find .RAW files in a directory
+
+    Directories that cannot be read are skipped (see scan_tree).
+
+    Args:
+      path (str): directory to search
+
+    Yields:
+      str: filepath for a .RAW volume
+    """
+    for entry in scan_tree(path):
+        if entry.name.endswith('.raw') and not entry.is_dir(follow_symlinks=False):
+            yield entry.path
+
+
 def sizeof_fmt(num, suffix='B', factor=1000.0):
     units = ['', 'K', 'M', 'G', 'T', 'P', 'E', 'Z']
     for unit in units:
@@ -142,6 +205,20 @@ def sizeof_fmt(num, suffix='B', factor=1000.0):
     return '{:.1f}{}{}'.format(num, 'Y', suffix)
 
 
+def to_uint8(arr):
+    """Quantize an array to 8-bit, keeping the most significant byte
+
+    Args:
+      arr (np.ndarray): integer or floating-point image data
+
+    Returns:
+      np.ndarray: 8-bit unsigned integer image data
+    """
+    if np.issubdtype(arr.dtype, np.integer):
+        return (arr >> (8 * (arr.itemsize - 1))).astype(np.uint8)
+    return np.clip(arr / 256, 0, 255).astype(np.uint8)
+
+
 def get_top_down_projection(args, fpath):
     """Generate a projection from the top-down view of a volume, using its
     maximum values per horizontal slice
@@ -154,7 +231,7 @@ def get_top_down_projection(args, fpath):
     # Extract the resolution from .DAT file
     dat_fp = rawfp2datfp(fpath)
     logging.debug(f'{dat_fp=}')
-    metadata = dat.read(dat_fp)
+    metadata = dat.read(dat_fp, fields={'dimensions', 'format'})
     x, y, z = metadata.dimensions
     bitdepth = dat.bitdepth_from_format(metadata.format)
     logging.debug(f'Volume dimensions: {x}, {y}, {z}')
@@ -188,91 +265,116 @@ def get_top_down_projection(args, fpath):
                 f'FileExistsWarning - {ofp}. File will be overwritten.',
             )
 
-    # Calculate the number of bytes in a *single* slice of .RAW datafile
-    # NOTE(tparker): This assumes that a unsigned 16-bit .RAW volume
-    buffer_size = x * y * np.dtype(bitdepth).itemsize
-    logging.debug(
-        f'Allocated memory for a slice (i.e., buffer_size): {buffer_size} bytes',
+    logging.info(f"Generating top-down projection for '{os.path.basename(fpath)}'")
+    # Map the volume into memory and 'squash' all of its slices together in
+    # a single reduction. .RAW volumes are little-endian, regardless of the
+    # host
+    volume = np.memmap(fpath, dtype=np.dtype(bitdepth).newbyteorder('<'), mode='r', shape=(z, y, x))
+    raw_image_data = np.empty((y, x), dtype=np.dtype(bitdepth))
+    if 'early_exit' in args and args.early_exit and np.issubdtype(raw_image_data.dtype, np.integer):
+        # Once every pixel holds the largest representable value, no later
+        # slice can change the projection, so stop reading the volume
+        saturated = np.iinfo(raw_image_data.dtype).max
+        raw_image_data.fill(0)
+        chunk_max = np.empty_like(raw_image_data)
+        for k in range(0, z, SLICES_PER_CHUNK):
+            np.max(volume[k:k + SLICES_PER_CHUNK], axis=0, out=chunk_max)
+            np.maximum(raw_image_data, chunk_max, out=raw_image_data)
+            if raw_image_data.min() == saturated:
+                logging.debug(f'Projection saturated after {k + SLICES_PER_CHUNK} of {z} slices')
+                break
+    elif _kernels is not None and volume.dtype.isnative:
+        _kernels.top_project(volume, raw_image_data)
+    else:
+        # NumPy releases the GIL while reducing, so split the rows of the
+        # projection into stripes and reduce them on separate threads
+        n_threads = min(getattr(args, 'threads', os.cpu_count() or 1), 8)
+        stripe = -(-y // n_threads)  # ceiling division
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            futures = [
+                executor.submit(
+                    np.max,
+                    volume[:, i:i + stripe],
+                    axis=0,
+                    out=raw_image_data[i:i + stripe],
+                )
+                for i in range(0, y, stripe)
+            ]
+            for future in futures:
+                future.result()
+    del volume
+
+    logging.debug(f'raw_image_data shape: {np.shape(raw_image_data)}')
+    try:
+        # 8-bit, 16-bit and floating-point arrays map onto the 'L', 'I;16'
+        # and 'F' image modes, sharing the array's buffer
+        if args.bits == 8 and not np.issubdtype(raw_image_data.dtype, np.floating):
+            raw_image_data = to_uint8(raw_image_data)
+        pngImage = Image.fromarray(raw_image_data)
+        pngImage.save(ofp)
+    except Exception as err:
+        logging.error(err)
+        sys.exit(1)
+    else:
+        logging.debug(f"Saving top-down projection as '{ofp}'")
+
+
+def load_font(size):
+    """Load the font used to label the scale of a side projection
+
+    Args:
+      size (int): font size
+
+    Returns:
+      FreeTypeFont: font for scale labels
+    """
+    font_fp = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+        'assets',
+        'OpenSans-Regular.ttf',
     )
+    logging.debug(f"Font filepath: '{font_fp}'")
+    return ImageFont.truetype(font_fp, size)
 
-    if not args.verbose:
-        # progress bar
-        pbar = tqdm(total=z, desc='Generating top-down projection')
-    with open(fpath, mode='rb', buffering=buffer_size) as ifp:
-        # Load in the first slice
-        byte_slice = ifp.read(buffer_size)  # Byte sequence
-        try:
-            np.zeros(y * x, dtype=np.dtype(bitdepth)).reshape(y, x)
-        except Exception as err:
-            logging.error(err)
-            return
 
-        raw_image_data = np.zeros(y * x, dtype=np.dtype(bitdepth)).reshape(y, x)
-        # For each slice in the volume....
-        while len(byte_slice) > 0:
-            # Convert bytes to 16-bit values
-            byte_sequence_max_values = np.frombuffer(
-                byte_slice,
-                dtype=np.dtype(bitdepth),
-            )
-            # Create a 2-D array of the data that is analogous to the image
-            byte_sequence_max_values = byte_sequence_max_values.reshape(y, x)
-            # 'Squash' together the brightest values so far with the current
-            # slice
-            raw_image_data = np.maximum(
-                raw_image_data,
-                byte_sequence_max_values,
-            )
-            # # Read the next slice & update progress bar
-            byte_slice = ifp.read(buffer_size)
-            if not args.verbose:
-                pbar.update(1)
-        if not args.verbose:
-            pbar.close()
-
-        # Convert raw bytes to array of 16-bit values
-        logging.debug(f'raw_image_data shape: {np.shape(raw_image_data)}')
-        arr = np.frombuffer(raw_image_data, dtype=np.dtype(bitdepth))
-        logging.debug(f'raw_image_data pixel count: {len(arr)}')
-        # Change the array from a byte sequence to a 2-D array with the same
-        # dimensions as the image
-        try:
-            arr = raw_image_data
-            array_buffer = arr.tobytes()
-            pngImage = Image.new('I', arr.T.shape)
-
-            if bitdepth == 'uint8':
-                mode = 'L'
-            elif bitdepth == 'uint16':
-                mode = 'I;16'
-            elif bitdepth == 'float32' or bitdepth == 'float':
-                mode = 'F'
-            else:
-                mode = 'I;16'
-            pngImage = Image.frombytes(mode, (x, y), array_buffer, decoder_name='raw')
-            pngImage.save(ofp)
+@lru_cache(maxsize=1024)
+def label_mask(text, font):
+    """Rasterize a scale label into a coverage mask
 
-        except Exception as err:
-            logging.error(err)
-            sys.exit(1)
-        else:
-            logging.debug(f"Saving top-down projection as '{ofp}'")
+    Labels are shared by every volume processed with the same font, so each
+    one is only rasterized once.
+
+    Args:
+      text (str): label text
+      font (FreeTypeFont): font for scale labels
+
+    Returns:
+      Image: 8-bit mask of the label
+    """
+    _, _, width, height = font.getbbox(text)
+    mask = Image.new('L', (width, height), 0)
+    ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=255)
+    return mask
 
 
-def get_side_projection(args, fpath):
+def get_side_projection(args, fpath, font=None):
     """Generate a projection from the profile view a volume, using its maximum
     values per slice
 
+    The volume is read as a (z, y, x) array and reduced along the y-axis,
+    giving an image with one row of x values per slice.
+
     Args:
       args (Namespace): user-defined arguments
       fp (str): filepath for a .RAW volume
+      font (FreeTypeFont): font for scale labels, loaded when needed if not
+        provided
 
     """
-    global font
     # Extract the resolution from .DAT file
     dat_fp = rawfp2datfp(fpath)
     logging.debug(f'{dat_fp=}')
-    metadata = dat.read(dat_fp)
+    metadata = dat.read(dat_fp, fields={'dimensions', 'format'})
     x, y, z = metadata.dimensions
     bitdepth = bitdepth_from_format(metadata.format)
     logging.debug(f'Volume dimensions: {x}, {y}, {z}')
@@ -297,7 +399,7 @@ def get_side_projection(args, fpath):
                     f"Cannot process '{fpath}'. Volume was larger than expected. Volume was expected to be of size '{expected_size}' but was '{actual_size}'. Please check data for corruption.",
                 )
             else:
-                z_prime = math.floor(actual_size / (x * y * 2))
+                z_prime = math.floor(actual_size / (x * y * np.dtype(bitdepth).itemsize))
                 logging.info(
                     f" Volume was expected to be of size '{expected_size}' but was '{actual_size}'. Please check data for corruption. Processing only '{z_prime}' of '{z}' slices.",
                 )
@@ -323,128 +425,86 @@ def get_side_projection(args, fpath):
                 f'FileExistsWarning - {ofp}. File will be overwritten.',
             )
 
-    # Calculate the number of bytes in a *single* slice of .RAW datafile
-    # NOTE(tparker): This assumes that a unsigned 16-bit .RAW volume
-    buffer_size = x * y * np.dtype(bitdepth).itemsize
-    logging.debug(
-        f'Allocated memory for a slice (i.e., buffer_size): {buffer_size} bytes',
-    )
-
-    if not args.verbose:
+    # Per-volume progress bars of concurrent workers would interleave, so
+    # they are only shown when volumes are processed one at a time
+    show_progress = not args.verbose and getattr(args, 'volume_progress', True)
+    if show_progress:
         pbar = tqdm(
             total=z,
             desc=f"Generating side-view projection for '{os.path.basename(fpath)}'",
+            miniters=max(1, z // 200),
         )  # progress bar
-    with open(fpath, mode='rb', buffering=buffer_size) as ifp:
-        # Load in the first slice
-        byte_slice = ifp.read(buffer_size)  # Byte sequence
-        raw_image_data = bytearray()
-        # For each slice in the volume....
-        while len(byte_slice) == buffer_size:
-            # Convert bytes to bit values
-            byte_sequence_max_values = np.frombuffer(
-                byte_slice,
-                dtype=np.dtype(bitdepth),
-            )
-
-            # Create a 2-D array of the data that is analogous to the image
-            byte_sequence_max_values = byte_sequence_max_values.reshape(y, x)
-            # 'Squash' the slice into a single row of pixels containing the
-            # highest value along the
-            byte_sequence_max_values = np.amax(
-                byte_sequence_max_values,
-                axis=0,
-            )
-            # Convert bit values back to bytes
-            byte_sequence_max_values = byte_sequence_max_values.tobytes()
-
-            # Append the maximum values to the resultant image
-            raw_image_data.extend(byte_sequence_max_values)
-            # Read the next slice & update progress bar
-            byte_slice = ifp.read(buffer_size)
-
-            if not args.verbose:
-                pbar.update(1)
-        if not args.verbose:
-            pbar.close()
-
-        # Convert raw bytes to array of bit values
-        logging.debug(f'raw_image_data length: {len(raw_image_data)}')
-        arr = np.frombuffer(raw_image_data, dtype=np.dtype(bitdepth))
-        logging.debug(f'arr length: {len(arr)}')
-        # Change the array from a byte sequence to a 2-D array with the same
-        # dimensions as the image
-        try:
-            logging.debug('Reshaping image')
-            logging.debug(f'arr = arr.reshape([{x}, {z}])')
-            logging.debug(f'{metadata.dimensions=}')
-            arr = arr.reshape([x, z])
-            logging.debug('array_buffer = arr.tobytes()')
-            array_buffer = arr.tobytes()
-            logging.debug(f'pngImage = Image.new("I", {arr.shape})')
-            pngImage = Image.new('I', arr.shape)
-            if bitdepth == 'uint8':
-                mode = 'L'
-            elif bitdepth == 'uint16':
-                mode = 'I;16'
-            elif bitdepth == 'float32' or bitdepth == 'float':
-                mode = 'F'
-            else:
-                mode = 'I;16'
-            # logging.debug(f"pngImage.frombytes(array_buffer, 'raw', '{mode}')")
-            # pngImage.frombytes(data=array_buffer, decoder_name='raw')
-            pngImage = Image.frombytes(mode, (x, z), array_buffer, decoder_name='raw')
+    # Map the volume into memory and write each row of the projection in
+    # place. .RAW volumes are little-endian, regardless of the host
+    volume = np.memmap(fpath, dtype=np.dtype(bitdepth).newbyteorder('<'), mode='r', shape=(z, y, x))
+    arr = np.empty((z, x), dtype=np.dtype(bitdepth))
+    if _kernels is not None and volume.dtype.isnative:
+        _kernels.side_project(volume, arr)
+        if show_progress:
+            pbar.update(z)
+    else:
+        # For each chunk of slices in the volume....
+        for k in range(0, z, SLICES_PER_CHUNK):
+            chunk = volume[k:k + SLICES_PER_CHUNK]
+            # 'Squash' each slice into a single row of pixels containing the
+            # highest value along the y-axis. NumPy dispatches the unsigned
+            # integer maximum to SIMD (e.g., AVX2, AVX-512) loops at runtime.
+            np.maximum.reduce(chunk, axis=1, out=arr[k:k + len(chunk)])
+
+            if show_progress:
+                pbar.update(len(chunk))
+    if show_progress:
+        pbar.close()
+    del volume
+
+    logging.debug(f'arr shape: {arr.shape}')
+    # The projection is already a 2-D array with one row per slice
+    try:
+        logging.debug(f'{metadata.dimensions=}')
+        if 'step' in args and args.step:
+            try:
+                fill = (255, 0, 0, 225)
+                if font is None:
+                    font = load_font(args.font_size)
+                # Convert from grayscale to RGB
+                gray = to_uint8(arr)
+                rgba = np.dstack([gray, gray, gray, np.full_like(gray, 255)])
+                # Add a line every nth slice
+                rgba[args.step::args.step, :101] = fill
+                img = Image.fromarray(rgba)
+
+                ascent, descent = font.getmetrics()
+                offset = (ascent + descent) // 2
+
+                _, height = img.size  # width is usused
+                slice_index = 0
+
+                while slice_index < height:
+                    slice_index += args.step
+                    # Adding text to current slice
+                    # Getting the ideal offset for the font
+                    # https://stackoverflow.com/questions/43060479/how-to-get-the-font-pixel-height-using-pil-imagefont
+                    text_y = slice_index - offset
+                    mask = label_mask(str(slice_index), font)
+                    label_width, label_height = mask.size
+                    img.paste(fill, (110, text_y, 110 + label_width, text_y + label_height), mask)
+                logging.debug('img.save(ofp)')
+                img.save(ofp)
+            except Exception as e:
+                logging.error(e)
+                raise
+        else:
+            if args.bits == 8 and not np.issubdtype(arr.dtype, np.floating):
+                arr = to_uint8(arr)
+            pngImage = Image.fromarray(arr)
             logging.debug('pngImage.save(ofp)')
             pngImage.save(ofp)
 
-            if 'step' in args and args.step:
-                try:
-                    fill = (255, 0, 0, 225)
-                    img = Image.open(ofp)
-                    # Convert from grayscale to RGB
-                    img = (
-                        ImageMath.eval('im/256', {'im': img})
-                        .convert('L')
-                        .convert('RGBA')
-                    )
-                    draw = ImageDraw.Draw(img)
-
-                    ascent, descent = font.getmetrics()
-                    offset = (ascent + descent) // 2
-
-                    _, height = img.size  # width is usused
-                    slice_index = 0
-
-                    while slice_index < height:
-                        slice_index += args.step
-                        # Adding text to current slice
-                        # Getting the ideal offset for the font
-                        # https://stackoverflow.com/questions/43060479/how-to-get-the-font-pixel-height-using-pil-imagefont
-                        text_y = slice_index - offset
-                        draw.text(
-                            (110, text_y),
-                            str(
-                                slice_index,
-                            ),
-                            font=font,
-                            fill=fill,
-                        )
-                        # Add line
-                        draw.line(
-                            (0, slice_index, 100, slice_index),
-                            fill=fill,
-                        )
-                    img.save(ofp)
-                except Exception as e:
-                    logging.error(e)
-                    raise
-
-        except Exception as err:
-            logging.error(err)
-            raise err
-            sys.exit(1)
-        else:
-            logging.debug(f"Saving side-view projection as '{ofp}'")
+    except Exception as err:
+        logging.error(err)
+        raise
+    else:
+        logging.debug(f"Saving side-view projection as '{ofp}'")
 
 
 def get_slice(args, fp):
@@ -458,7 +518,7 @@ def get_slice(args, fp):
     # Extract the resolution from .DAT file
     dat_fp = rawfp2datfp(fp)
     logging.debug(f'{dat_fp=}')
-    x, y, z = dat.read(dat_fp)['dimensions']
+    x, y, z = dat.read(dat_fp, fields={'dimensions'}).dimensions
 
     # Get the requested slice index
     i = int(math.floor(x / 2))  # set default to midslice
@@ -487,52 +547,21 @@ def get_slice(args, fp):
                 f'FileExistsWarning - {ofp}. File will be overwritten.',
             )
 
-    # Calculate the number of bytes in a *single* slice of .RAW data file
+    # Calculate the index bounds for the slice
     # NOTE(tparker): This assumes that an unsigned 16-bit .RAW volume
-    buffer_size = x * y * np.dtype('uint16').itemsize
-
-    # Calculate the index bounds for the bytearray of a slice
-    # This byte array is a 1-D array of the image data for the current slice
-    # The index defined
     if i < 0 or i > y - 1:
         logging.error(
             f"OutOfBoundsError - Index specified, '{i}' outside of dimensions of image. Image dimensions are ({x}, {y}). Slices are indexed from 0 to {y - 1}, inclusive.",
         )
         sys.exit(1)
-    start_byte = np.dtype('uint16').itemsize * x * i
-    end_byte = np.dtype('uint16').itemsize * x * (i + 1)
-    logging.debug(
-        f'Relative byte indices for extracted slice: <{start_byte}, {end_byte}>',
-    )
-    logging.debug(
-        f'Allocated memory for a slice (i.e., buffer_size): {buffer_size} bytes',
-    )
 
-    if not args.verbose:
-        pbar = tqdm(total=z, desc=f'Extracting slice #{i}')  # progress bar
-    with open(fp, mode='rb', buffering=buffer_size) as ifp:
-        byte_slice = ifp.read(buffer_size)  # Byte sequence
-        raw_byte_string = bytearray()
-        # So long as there is data left in the .RAW, extract the next byte
-        # subset
-        while len(byte_slice) > 0:
-            ith_byte_sequence = byte_slice[start_byte:end_byte]
-            raw_byte_string.extend(ith_byte_sequence)
-            byte_slice = ifp.read(buffer_size)
-            if not args.verbose:
-                pbar.update(1)
-        if not args.verbose:
-            pbar.close()
-
-    # Convert raw bytes to array of 16-bit values
-    arr = np.frombuffer(raw_byte_string, dtype=np.uint16)
-    # Change the array from a byte sequence to a 2-D array with the same
-    # dimensions as the image
     try:
-        arr = arr.reshape([z, x])
-        array_buffer = arr.tobytes()
-        pngImage = Image.new('I', arr.T.shape)
-        pngImage.frombytes(array_buffer, 'raw', 'I;16')
+        # The side-view slice is the i-th row of every horizontal slice, so
+        # only those rows are read from disk rather than the whole volume
+        volume = np.memmap(fp, dtype=np.dtype('<u2'), mode='r', shape=(z, y, x))
+        arr = np.ascontiguousarray(volume[:, i, :], dtype=np.uint16)
+        del volume
+        pngImage = Image.fromarray(arr)
         pngImage.save(ofp)
     except Exception as err:
         logging.error(err)
@@ -541,6 +570,51 @@ def get_slice(args, fp):
         logging.debug(f"Saving Slice #{i} as '{ofp}'")
 
 
+def init_worker(threads):
+    """Limit the threads used by a worker process to process a volume
+
+    Args:
+      threads (int): number of threads per volume
+    """
+    if _kernels is not None:
+        _kernels.set_num_threads(threads)
+
+
+def process_one(args, fp, font=None):
+    """Extract the requested slice and projections from a single .RAW volume
+
+    Args:
+      args (Namespace): user-defined arguments
+      fp (str): filepath for a .RAW volume
+      font (FreeTypeFont): font for scale labels
+    """
+    # Each volume gets its own copy of the arguments, since they are updated
+    # per volume
+    args = argparse.Namespace(**vars(args))
+    # Set working directory for file
+    args.cwd = os.path.dirname(os.path.abspath(fp))
+    fp = os.path.abspath(fp)
+
+    # Format file size
+    n_bytes = os.path.getsize(fp)
+    if args.si:
+        filesize = sizeof_fmt(n_bytes)
+    else:
+        filesize = f'{n_bytes} B'
+
+    # Process files
+    logging.debug(f"Processing '{fp}' ({filesize})")
+    if 'index' in args and args.index is not None:
+        if args.index is True:
+            args.index = None
+        get_slice(args, fp)
+    if args.projection is not None:
+        if 'side' in args.projection:
+            get_side_projection(args, fp, font=font)
+        if 'top' in args.projection:
+            get_top_down_projection(args, fp)
+
+
 def cli():
     """Quality control tools"""
     description = 'Check the quality of a .RAW volume by extracting a slice or generating a projection. Requires a .RAW and .DAT for each volume.'
@@ -549,11 +623,14 @@ def cli():
     parser.add_argument('-V', '--version', action='version', version=f'%(prog)s {__version__}')
     parser.add_argument('-v', '--verbose', action='store_true', help='Increase output verbosity')
     parser.add_argument('-f', '--force', action='store_true', default=False, help='Force file creation. Overwrite any existing files.')
+    parser.add_argument('-t', '--threads', metavar='N', type=int, default=os.cpu_count() or 1, help='Specify upper limit for number of threads used during processing')
     parser.add_argument('--si', action='store_true', default=False, help='logging.debug human readable sizes (e.g., 1 K, 234 M, 2 G)')
     parser.add_argument('-p', '--projection', action='store', nargs='+', help="Generate projection using maximum values for each slice. Available options: [ 'top', 'side' ].")
     parser.add_argument('--scale', dest='step', const=100, action='store', nargs='?', default=argparse.SUPPRESS, type=int, help='Add scale on left side of a side projection. Step is the number of slices between each label. (default: 100)')
     parser.add_argument('-s', '--slice', dest='index', const=True, nargs='?', type=int, default=argparse.SUPPRESS, help="Extract a slice from volume's side view. (default: floor(x/2))")
     parser.add_argument('--font-size', dest='font_size', action='store', type=int, default=24, help='Font size of labels of scale.')
+    parser.add_argument('--early-exit', dest='early_exit', action='store_true', default=False, help='Stop reading a volume once its top-down projection is saturated.')
+    parser.add_argument('--bits', dest='bits', action='store', type=int, default=8, choices=[8, 16], help='Bit-depth of projections. Floating-point projections are always saved at full precision.')
     parser.add_argument('path', metavar='PATH', type=str, nargs='+', help='Filepath to a .RAW or path to a directory that contains .RAW files.')
     args = parser.parse_args()
 
@@ -565,7 +642,6 @@ def cli():
 
 def main():
     """Begin processing"""
-    global font
     args = cli()
 
     logging.debug(f'File(s) selected: {args.path}')
@@ -582,100 +658,49 @@ def main():
             # If a directory, collect all contained .raw files and append to
             if os.path.isdir(afp):
                 logging.debug(f"Is a directory '{fp}'")
-                list_dirs = os.walk(fp)
-                for root, dirs, files in list_dirs:
-                    # Convert to fully qualified paths
-                    files = [os.path.join(root, f) for f in files]
-                    raw_files = [
-                        f for f in files if os.path.splitext(f)[
-                            1
-                        ] == '.raw'
-                    ]
-                    logging.debug(f'Found .raw files {raw_files}')
-                    for filename in raw_files:
-                        logging.debug(f"Verifying '{filename}'")
-                        # Since we traversed the path to find this file, it
-                        # should exist. This could cause a race condition if
-                        # someone were to delete the file while this script was
-                        # running
-
-                        basename, extension = os.path.splitext(filename)
-                        dat_filename = basename + '.dat'
-                        # Only parse .raw files
-                        if extension == '.raw':
-                            # Check if it has a .dat
-                            if not os.path.exists(dat_filename):
-                                logging.warning(
-                                    f"Missing '.dat' file: '{dat_filename}'",
-                                )
-                            elif not os.path.isfile(dat_filename):
-                                logging.warning(
-                                    f"Provided '.dat' is not a file: '{dat_filename}'",
-                                )
-                            else:
-                                args.path.append(filename)
+                for filename in iter_raw(fp):
+                    logging.debug(f"Verifying '{filename}'")
+                    # Since we traversed the path to find this file, it
+                    # should exist. This could cause a race condition if
+                    # someone were to delete the file while this script was
+                    # running
+                    # Check if it has a .dat
+                    if has_dat(filename):
+                        args.path.append(filename)
             else:
                 logging.warning(f"Is not a file or directory: '{fp}'")
         else:
-            basename, extension = os.path.splitext(fp)
-            dat_filename = basename + '.dat'
-            # Only parse .raw files
-            if extension == '.raw':
-                # Check if it has a .dat
-                if not os.path.exists(dat_filename):
-                    logging.warning(f"Missing '.dat' file: '{dat_filename}'")
-                elif not os.path.isfile(dat_filename):
-                    logging.warning(
-                        f"Provided '.dat' is not a file: '{dat_filename}'",
-                    )
-                else:
-                    args.path.append(fp)
-
-    args.path = list(set(args.path))
+            # Only parse .raw files, and check if it has a .dat
+            if os.path.splitext(fp)[1] == '.raw' and has_dat(fp):
+                args.path.append(fp)
+
+    args.path = list(dict.fromkeys(args.path))
     logging.info(f'Found {len(args.path)} .raw file(s).')
     logging.debug(args.path)
     if 'index' not in args and not args.projection:
         logging.warning('No action specified.')
     else:
+        # Load font once for all volumes, and only when a scale is drawn
+        font = None
+        if 'step' in args and args.step:
+            font = load_font(args.font_size)
         if not args.verbose:
             total_pbar = tqdm(total=len(args.path), desc='Total Progress')
-        for fp in args.path:
-            # Set working directory for file
-            args.cwd = os.path.dirname(os.path.abspath(fp))
-            fp = os.path.abspath(fp)
-
-            # Format file size
-            n_bytes = os.path.getsize(fp)
-            if args.si:
-                filesize = sizeof_fmt(n_bytes)
-            else:
-                filesize = f'{n_bytes} B'
-
-            # Process files
-            # Load font
-            font_fp = '/'.join(
-                [
-                    os.path.dirname(os.path.realpath(__file__)),
-                    'assets',
-                    'OpenSans-Regular.ttf',
-                ],
-            )
-            logging.debug(f"Font filepath: '{font_fp}'")
-            font = ImageFont.truetype(font_fp, args.font_size)
-            logging.debug(f"Processing '{fp}' ({filesize})")
-            if 'index' in args and args.index is not None:
-                if args.index is True:
-                    args.index = None
-                get_slice(args, fp)
-                args.index = True  # re-enable slice for the next volume
-            if args.projection is not None:
-                if 'side' in args.projection:
-                    get_side_projection(args, fp)
-                if 'top' in args.projection:
-                    get_top_down_projection(args, fp)
-
-            if not args.verbose:
-                total_pbar.update()
+        # Volumes are independent of one another, so process several at once.
+        # Only one level of parallelism is used: the threads are split among
+        # the worker processes, so with many volumes each one is processed on
+        # a single thread, and a lone volume gets every thread
+        threads = max(1, min(args.threads, os.cpu_count() or 1))
+        max_workers = max(1, min(threads, len(args.path)))
+        args.threads = max(1, threads // max_workers)
+        args.volume_progress = max_workers == 1
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(args.threads,)) as executor:
+            # Report progress as volumes finish, not in submission order
+            futures = [executor.submit(process_one, args, fp, font) for fp in args.path]
+            for future in as_completed(futures):
+                future.result()
+                if not args.verbose:
+                    total_pbar.update()
         if not args.verbose:
             total_pbar.close()
 
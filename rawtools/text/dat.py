@@ -5,8 +5,11 @@ import logging
 import os
 import re
 import textwrap
+from collections.abc import Iterable
 from dataclasses import asdict
 from dataclasses import dataclass
+from dataclasses import replace
+from functools import lru_cache
 from math import prod
 
 from rawtools.utils.path import FilePath
@@ -29,6 +32,10 @@ class Dat:
     model: str | None = None
 
 
+# Names of all attributes of Dat
+DAT_FIELDS = frozenset(asdict(Dat()))
+
+
 def format_from_bitdepth(name: str) -> str:
     """Converts the name of numpy.dtype (string) to bit-depth (string)
 
@@ -73,17 +80,31 @@ def bitdepth_from_format(format: str) -> str:
         raise ValueError(f"'{format}' is not a known format: {known_types.items()}")
 
 
-def determine_bit_depth(fpath: FilePath, dims: tuple[int, int, int]) -> str:
+def determine_bit_depth(fpath: FilePath, dims: tuple[int, int, int], filesize: int | None = None) -> str:
     """Determine the bit depth of a .RAW based on its dimensions and slick thickness (i.e., resolution)
 
+    Results are cached per path, file size and dimensions. Warnings about
+    possible data corruption are logged on every call.
+
     Args:
         fpath (str): file path to .RAW
         dims (x, y, z): dimensions of .RAW extracted
+        filesize (int, optional): size of the .RAW in bytes, if already known. Defaults to None, which reads it from the file system.
 
     Returns:
         str: numpy dtype encoding of bit depth
     """
-    filesize = os.stat(fpath).st_size
+    if filesize is None:
+        filesize = os.stat(fpath).st_size
+    bitdepth, warning = __determine_bit_depth_cached(os.fspath(fpath), filesize, tuple(dims))
+    if warning is not None:
+        logging.warning(warning)
+    return bitdepth
+
+
+@lru_cache(maxsize=1024)
+def __determine_bit_depth_cached(fpath: str, filesize: int, dims: tuple[int, ...]) -> tuple[str, str | None]:
+    """bit depth of a .RAW of a given size, and a warning if it looks corrupt"""
     # get product of dimensions
     minimum_size = prod(dims)
     logging.debug(f"Minimum calculated size of '{fpath}' is {minimum_size} bytes")
@@ -94,25 +115,22 @@ def determine_bit_depth(fpath: FilePath, dims: tuple[int, int, int]) -> str:
 
     # Corrupt uint8
     if filesize < expected_uint8_fsize:
-        logging.warning(f"Detected possible data corruption. File is smaller than expected '{fpath}'. Expected at <{expected_uint8_fsize}> bytes but found <{filesize}> bytes. Defaulting to unsigned 8-bit.")
-        return 'uint8'
+        return 'uint8', f"Detected possible data corruption. File is smaller than expected '{fpath}'. Expected at <{expected_uint8_fsize}> bytes but found <{filesize}> bytes. Defaulting to unsigned 8-bit."
     # Valid uint8
     if filesize == expected_uint8_fsize:
-        return 'uint8'
+        return 'uint8', None
     # Valid uint16
     elif filesize == expected_uint16_fsize:
-        return 'uint16'
+        return 'uint16', None
     # Valid float32
     elif filesize == expected_float32_fsize:
-        return 'float32'
+        return 'float32', None
     # Corrupt uint16
     elif expected_uint8_fsize < filesize < expected_uint16_fsize:
-        logging.warning(f"Detected possible data corruption. File is smaller than expected '{fpath}'. Expected at <{expected_uint16_fsize}> bytes but found <{filesize}> bytes. Defaulting to unsigned 16-bit.")
-        return 'uint16'
+        return 'uint16', f"Detected possible data corruption. File is smaller than expected '{fpath}'. Expected at <{expected_uint16_fsize}> bytes but found <{filesize}> bytes. Defaulting to unsigned 16-bit."
     # Corrupt float32
     elif expected_uint16_fsize < filesize < expected_float32_fsize:
-        logging.warning(f"Detected possible data corruption. File is smaller than expected '{fpath}'. Expected at <{expected_float32_fsize}> bytes but found <{filesize}> bytes. Defaulting to signed 32-bit.")
-        return 'float32'
+        return 'float32', f"Detected possible data corruption. File is smaller than expected '{fpath}'. Expected at <{expected_float32_fsize}> bytes but found <{filesize}> bytes. Defaulting to signed 32-bit."
     # Unidentifiable (too large!)
     elif expected_float32_fsize < filesize:
         raise Exception(f"Unable to determine bit-depth of volume '{fpath}'. Expected at <{expected_float32_fsize}> bytes but found <{filesize}> bytes. Double check the file's format/bitdepth. This may be stored in the accompanying .dat file.")
@@ -120,13 +138,60 @@ def determine_bit_depth(fpath: FilePath, dims: tuple[int, int, int]) -> str:
     raise Exception("Unable to determine bitdepth for '{fpath}'.")
 
 
-def __parse_object_filename(line: str, dat_format: str) -> str | None:
-    if dat_format == 'Dragonfly':
-        pattern = r'\s*<ObjectFileName>\s*(?P<filename>.*\.raw)\s*<\/ObjectFileName>'
-    elif dat_format == 'NSI':
-        pattern = r'\s*ObjectFileName\:\s+(?P<filename>.*\.raw)\s*$'
+# Line patterns, compiled once per syntax (Dragonfly or NSI)
+_DRAGONFLY_HEADER = re.compile(r"<\?xml\sversion=\"1\.0\"\?>", flags=re.IGNORECASE)
+_OBJECT_FILENAME = {
+    'Dragonfly': re.compile(r'\s*<ObjectFileName>\s*(?P<filename>.*\.raw)\s*<\/ObjectFileName>', flags=re.IGNORECASE),
+    'NSI': re.compile(r'\s*ObjectFileName\:\s+(?P<filename>.*\.raw)\s*$', flags=re.IGNORECASE),
+}
+_RESOLUTION = {
+    'Dragonfly': re.compile(r'\s*<Resolution X="(?P<x>\d+)"\s+Y="(?P<y>\d+)"\s+Z="(?P<z>\d+)"', flags=re.IGNORECASE),
+    'NSI': re.compile(r'\s*Resolution\:\s+(?P<x>\d+)\s+(?P<y>\d+)\s+(?P<z>\d+)', flags=re.IGNORECASE),
+}
+_RESOLUTION_OLD_NSI = re.compile(r'\s+<Resolution X="(?P<x>\d+)"\s+Y="(?P<y>\d+)"\s+Z="(?P<z>\d+)"', flags=re.IGNORECASE)
+_SLICE_THICKNESS = {
+    'Dragonfly': re.compile(r'\s*<Spacing\s+X="(?P<xth>\d+(\.\d+(e-\d+)?)?)"\s+Y="(?P<yth>\d+(\.\d+(e-\d+)?)?)"\s+Z="(?P<zth>\d+(\.\d+(e-\d+)?)?)"\s+\/>\s*', flags=re.IGNORECASE),
+    'NSI': re.compile(r'\w+\:\s+(?P<xth>\d+\.\d+)\s+(?P<yth>\d+\.\d+)\s+(?P<zth>\d+\.\d+)', flags=re.IGNORECASE),
+}
+_FORMAT = {
+    'Dragonfly': re.compile(r'\s*<Format>(?P<format>\w+)<\/Format>', flags=re.IGNORECASE),
+    'NSI': re.compile(r'Format\:\s+(?P<format>\w+)$', flags=re.IGNORECASE),
+}
+_OBJECT_MODEL = {
+    'Dragonfly': re.compile(r'\s*<Unit>(?P<object_model>\w+)<\/Unit>', flags=re.IGNORECASE),
+    'NSI': re.compile(r'^ObjectModel\:\s+(?P<object_model>\w+)$', flags=re.IGNORECASE),
+}
+
+
+def __combine_line_patterns(dat_format: str) -> re.Pattern:
+    """Join the line patterns of a syntax into a single alternation
+
+    Each field is wrapped in its own named group, so the field that matched a
+    line is given by `Match.lastgroup`.
+
+    Args:
+        dat_format (str): Dragonfly or NSI
+
+    Returns:
+        re.Pattern: compiled pattern for any line of interest
+    """
+    fields = dict(
+        header=_DRAGONFLY_HEADER,
+        object_filename=_OBJECT_FILENAME[dat_format],
+        resolution=_RESOLUTION[dat_format],
+        slice_thickness=_SLICE_THICKNESS[dat_format],
+        file_format=_FORMAT[dat_format],
+        model=_OBJECT_MODEL[dat_format],
+    )
+    pattern = '|'.join(f'(?P<{field}>{regex.pattern})' for field, regex in fields.items())
+    return re.compile(pattern, flags=re.IGNORECASE)
+
 
-    match = re.match(pattern, line, flags=re.IGNORECASE)
+_LINE = {dat_format: __combine_line_patterns(dat_format) for dat_format in ['Dragonfly', 'NSI']}
+
+
+def __parse_object_filename(line: str, dat_format: str) -> str | None:
+    match = _OBJECT_FILENAME[dat_format].match(line)
 
     if match is not None:
         logging.debug(f'Match: {match}')
@@ -145,17 +210,11 @@ def __parse_resolution(line: str, dat_format: str) -> tuple[int, int, int] | Non
         (int, int, int): x, y, z dimensions of volume as a tuple
 
     """
-    if dat_format == 'Dragonfly':
-        pattern = r'\s*<Resolution X="(?P<x>\d+)"\s+Y="(?P<y>\d+)"\s+Z="(?P<z>\d+)"'
-    elif dat_format == 'NSI':
-        pattern_old_nsi = r'\s+<Resolution X="(?P<x>\d+)"\s+Y="(?P<y>\d+)"\s+Z="(?P<z>\d+)"'
-        pattern = r'\s*Resolution\:\s+(?P<x>\d+)\s+(?P<y>\d+)\s+(?P<z>\d+)'
-
     # See if the DAT file is the newer version
-    match = re.match(pattern, line, flags=re.IGNORECASE)
+    match = _RESOLUTION[dat_format].match(line)
     # Otherwise, check the old version (XML)
     if match is None and dat_format == 'NSI':
-        match = re.match(pattern_old_nsi, line, flags=re.IGNORECASE)
+        match = _RESOLUTION_OLD_NSI.match(line)
         if match is not None:
             logging.debug(f"XML format detected for '{line}'")
     else:
@@ -180,12 +239,7 @@ def __parse_slice_thickness(line: str, dat_format: str) -> tuple[float, float, f
         (float, float, float): x, y, z real-world thickness in mm. Otherwise, returns None.
 
     """
-    if dat_format == 'Dragonfly':
-        pattern = r'\s*<Spacing\s+X="(?P<xth>\d+(\.\d+(e-\d+)?)?)"\s+Y="(?P<yth>\d+(\.\d+(e-\d+)?)?)"\s+Z="(?P<zth>\d+(\.\d+(e-\d+)?)?)"\s+\/>\s*'
-    elif dat_format == 'NSI':
-        pattern = r'\w+\:\s+(?P<xth>\d+\.\d+)\s+(?P<yth>\d+\.\d+)\s+(?P<zth>\d+\.\d+)'
-
-    match = re.match(pattern, line, flags=re.IGNORECASE)
+    match = _SLICE_THICKNESS[dat_format].match(line)
 
     if match is not None:
         logging.debug(f'Match: {match}')
@@ -206,12 +260,7 @@ def __parse_slice_thickness(line: str, dat_format: str) -> tuple[float, float, f
 
 
 def __parse_format(line: str, dat_format: str) -> str | None:
-    if dat_format == 'Dragonfly':
-        pattern = r'\s*<Format>(?P<format>\w+)<\/Format>'
-    elif dat_format == 'NSI':
-        pattern = r'Format\:\s+(?P<format>\w+)$'
-
-    match = re.match(pattern, line, flags=re.IGNORECASE)
+    match = _FORMAT[dat_format].match(line)
     if match is not None:
         logging.debug(f'Match: {match}')
         return match.group('format')
@@ -219,12 +268,7 @@ def __parse_format(line: str, dat_format: str) -> str | None:
 
 
 def __parse_object_model(line: str, dat_format: str) -> str | None:
-    if dat_format == 'Dragonfly':
-        pattern = r'\s*<Unit>(?P<object_model>\w+)<\/Unit>'
-    elif dat_format == 'NSI':
-        pattern = r'^ObjectModel\:\s+(?P<object_model>\w+)$'
-
-    match = re.match(pattern, line, flags=re.IGNORECASE)
+    match = _OBJECT_MODEL[dat_format].match(line)
     if match is not None:
         logging.debug(f'Match: {match}')
         return match.group('object_model')
@@ -232,58 +276,84 @@ def __parse_object_model(line: str, dat_format: str) -> str | None:
 
 
 def __is_dragonfly_dat_format(line: str) -> bool:
-    pattern = r"<\?xml\sversion=\"1\.0\"\?>"
-    match = re.match(pattern, line, flags=re.IGNORECASE)
+    match = _DRAGONFLY_HEADER.match(line)
     if match is not None:
         logging.debug(f'Match: {match}')
     return bool(match)
 
 
-def read(fpath: FilePath) -> Dat:
+def read(fpath: FilePath, fields: Iterable[str] | None = None) -> Dat:
     """Read a .DAT file
+
+    Parsed files are cached until their size or modification time changes.
+    Only the most recently read files are kept.
+
     Args:
     fpath (str): filepath for .DAT file
+    fields (Iterable[str], optional): names of the Dat attributes needed by the caller (e.g., {'dimensions'}). Parsing stops once all of them are found, and only they are required to be present. Defaults to None, which requires all of them.
     Returns:
     dict: contents of .DAT file
     """
+    if fields is not None:
+        fields = frozenset(fields)
+        if unknown_fields := fields - DAT_FIELDS:
+            raise ValueError(f'Unknown .DAT field(s): {sorted(unknown_fields)}. Expected any of {sorted(DAT_FIELDS)}.')
+    st = os.stat(fpath)
+    dat = __read_cached(os.fspath(fpath), st.st_mtime_ns, st.st_size, fields)
+    # Hand out a copy so that callers cannot modify the cached entry
+    return replace(dat, path=fpath)
+
+
+@lru_cache(maxsize=1024)
+def __read_cached(fpath: str, mtime_ns: int, size: int, fields: frozenset[str] | None) -> Dat:
+    """parse a .DAT file; the modification time and size only key the cache"""
+    required_fields = DAT_FIELDS if fields is None else fields
     # data = {}
     dat = Dat()
     dat.path = fpath
     dat.syntax = 'NSI'
     with open(fpath) as ifp:
-        # Parse the individual lines
-        for line in ifp.readlines():
+        # Parse the individual lines with a single match each
+        for line in ifp:
             line = line.strip()
+            match = _LINE[dat.syntax].match(line)
+            if match is None:
+                continue
+            logging.debug(f'Match: {match}')
+            field = match.lastgroup
+
             # Determine if format is NSI .dat or Dragonfly .dat
-            if __is_dragonfly_dat_format(line):
+            if field == 'header':
                 dat.syntax = 'Dragonfly'
 
-            if (
-                object_filename := __parse_object_filename(line, dat.syntax)
-            ) is not None:
-                dat.object_filename = object_filename
+            elif field == 'object_filename':
+                dat.object_filename = match.group('filename')
 
-            if (resolution := __parse_resolution(line, dat.syntax)) is not None:
-                dat.xdim, dat.ydim, dat.zdim = resolution
+            elif field == 'resolution':
+                dat.xdim, dat.ydim, dat.zdim = (int(match.group(axis)) for axis in ['x', 'y', 'z'])
                 dat.dimensions = dat.xdim, dat.ydim, dat.zdim
 
-            if (thicknesses := __parse_slice_thickness(line, dat.syntax)) is not None:
-                (
-                    dat.x_thickness,
-                    dat.y_thickness,
-                    dat.z_thickness,
-                ) = thicknesses
+            elif field == 'slice_thickness':
+                thicknesses = [float(match.group(axis)) for axis in ['xth', 'yth', 'zth']]
+                # Change Dragonfly thickness units (meters) to match NSI format
+                if dat.syntax == 'Dragonfly':
+                    thicknesses = [th * 1000 for th in thicknesses]  # convert to millimeters
+                dat.x_thickness, dat.y_thickness, dat.z_thickness = thicknesses
                 dat.thickness = dat.x_thickness, dat.y_thickness, dat.z_thickness
 
-            if (file_format := __parse_format(line, dat.syntax)) is not None:
-                dat.format = file_format
+            elif field == 'file_format':
+                dat.format = match.group('format')
+
+            elif field == 'model':
+                dat.model = match.group('object_model')
 
-            if (object_model := __parse_object_model(line, dat.syntax)) is not None:
-                dat.model = object_model
+            # Stop early once everything the caller asked for is known
+            if fields is not None and all(getattr(dat, name) is not None for name in fields):
+                break
 
     # Check that all the required values could be extracted
     # All keys must have a valid assigned a value
-    if not any(value is None for value in asdict(dat).values()):
+    if not any(getattr(dat, name) is None for name in required_fields):
         return dat
     raise ValueError(f"Unable to parse '{fpath}'.")
 
@@ -339,11 +409,11 @@ def write(fpath: FilePath, dimensions: tuple[int, ...], thickness: tuple[float,
         )
 
     # Checking typing of dimensions
-    # Check for int typing
-    # If any dimension is not an integer value, throw a type error
-    if not all(str(dim).isdigit() for dim in [xdim, ydim, zdim]):
+    # The dimensions were already cast to int above, so only their sign is
+    # left to check
+    if not all(dim >= 0 for dim in [xdim, ydim, zdim]):
         raise TypeError(
-            f'Dimensions must be integer values: {(xdim, ydim, zdim)}',
+            f'Dimensions must be non-negative integer values: {(xdim, ydim, zdim)}',
         )
 
     # SliceThickness
@@ -1,20 +1,30 @@
 from __future__ import annotations
 
+import logging
 import os
+import stat
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from functools import cached_property
-from pathlib import Path
+from typing import Iterator
 
 from rawtools.constants import ATOMIC_FILETYPES
 from rawtools.constants import COMPOSITE_FILETYPES
 from rawtools.utils.path import FilePath
 from rawtools.utils.path import find_slice_directories
 from rawtools.utils.path import infer_filetype_from_path
+from rawtools.utils.path import infer_metatype_from_extension
 from rawtools.utils.path import infer_metatype_from_path
 from rawtools.utils.path import is_slice_directory
+from rawtools.utils.path import MAX_SCAN_WORKERS
+from rawtools.utils.path import scan_tree
 from rawtools.utils.path import uid_from_path
+from rawtools.utils.path import UnknownFiletypeError
 from rawtools.utils.path import uuid_from_path
 
+# File extensions of slices, for str.endswith
+_COMPOSITE_SUFFIXES = tuple(f'.{ext}' for ext in COMPOSITE_FILETYPES)
+
 
 @dataclass
 class Dataset:
@@ -28,6 +38,10 @@ class Dataset:
         path (str): real path
         metatype (str): fundamental data type (e.g., volume, voxel, image)
     """
+    # Collections can hold a great many datasets, so instances carry no
+    # __dict__; derived values are cached in their own slots
+    __slots__ = ('path', 'metatype', 'ext', '_uid', '_uuid', '_hash')
+
     path: FilePath
     metatype: str
     ext: str
@@ -45,43 +59,48 @@ class Dataset:
     def collection(self) -> str:  # TODO: typically this is called the "dataset". Consider renaming?
         raise NotImplementedError
 
-    @cached_property
-    def uid(self) -> str:
-        return uid_from_path(self.path)
-
-    @cached_property
-    def uuid(self) -> str:
-        return uuid_from_path(self.path)
-
     @property
     def comment(self) -> tuple[str]:
         raise NotImplementedError
 
     def __init__(self, path: FilePath, metatype: str | None = None, ext: str | None = None):
         self.path = os.path.normpath(path)
+        self._uid: str | None = None
+        self._uuid: str | None = None
+        # Metatypes and extensions come from a small set of values, so
+        # datasets share a single copy of each
         if metatype is not None:
-            self.metatype = metatype
+            self.metatype = sys.intern(metatype)
         else:
-            self.metatype = infer_metatype_from_path(self.path)
+            self.metatype = sys.intern(infer_metatype_from_path(self.path))
 
         if ext is not None:
-            self.ext = ext
+            self.ext = sys.intern(ext)
         else:
             self.ext = infer_filetype_from_path(self.path)
 
+        # Fields are not reassigned after construction, so hash them once
+        self._hash = hash((self.path, self.metatype, self.ext))
+
+    @property
+    def uid(self) -> str:
+        if self._uid is None:
+            self._uid = uid_from_path(self.path)
+        return self._uid
+
+    @property
+    def uuid(self) -> str:
+        if self._uuid is None:
+            self._uuid = uuid_from_path(self.path)
+        return self._uuid
+
     def __repr__(self):
         return f"{type(self).__name__}('{self.path}', '{self.metatype}', '{self.ext}')"
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Dataset):
             return NotImplemented
-        return all(
-            [
-                self.path == other.path,
-                self.metatype == other.metatype,
-                self.ext == other.ext,
-            ],
-        )
+        return self.path == other.path and self.metatype == other.metatype and self.ext == other.ext
 
     def __lt__(self, other: object) -> bool:
         if not isinstance(other, Dataset):
@@ -89,10 +108,10 @@ class Dataset:
         return str(self.path) < str(other.path)
 
     def asdict(self):
-        return dict(vars(self).items())
+        return dict(path=self.path, metatype=self.metatype, ext=self.ext)
 
     def __hash__(self):
-        return hash((self.path, self.metatype, self.ext))
+        return self._hash
 
 
 def collect_datasets(*paths: FilePath, filetype: str, recursive: bool = False) -> list[Dataset]:
@@ -111,92 +130,86 @@ def collect_datasets(*paths: FilePath, filetype: str, recursive: bool = False) -
     Returns:
         List[Dataset]: refined list of paths with best-guess at data file format
     """
-    posix_paths: list[Path] = [Path(str(p)) for p in paths]
+    return list(iter_datasets(*paths, filetype=filetype, recursive=recursive))
 
-    datasets: list[Dataset] = []
+
+def iter_datasets(*paths: FilePath, filetype: str, recursive: bool = False) -> Iterator[Dataset]:
+    """Lazily find all files that match file type
+
+    Datasets are yielded as they are found, so only one directory's worth of
+    entries is held at a time. See collect_datasets.
+
+    Args:
+        paths (Sequence[FilePath]): path or list of paths to search
+        filetype (str | None, optional): file format for input data. Defaults to None.
+        recursive (bool): search file structure recursively. Defaults to False.
+
+    Yields:
+        Dataset: path with best-guess at data file format
+    """
+    # Paths stay as normalized strings; Dataset normalizes them regardless
+    str_paths: list[str] = [os.path.normpath(p) for p in paths]
+    suffix = f'.{filetype}'
 
     # Partition the directories and the files for the user-specified paths
-    dir_paths: list[FilePath] = []
-    file_paths: list[FilePath] = []
-    for path in posix_paths:
-        fpath: str = str(path)
-        ext = fpath.rpartition('.')[-1]
-        if os.path.isdir(fpath):
+    dir_paths: list[str] = []
+    file_paths: list[str] = []
+    for fpath in str_paths:
+        # One stat answers both checks
+        try:
+            mode = os.stat(fpath).st_mode
+        except (OSError, ValueError):
+            continue
+        if stat.S_ISDIR(mode):
             dir_paths.append(fpath)
-        elif os.path.isfile(fpath) and ext not in COMPOSITE_FILETYPES:
+        elif stat.S_ISREG(mode) and not fpath.endswith(_COMPOSITE_SUFFIXES):
             file_paths.append(fpath)
 
     # ==========================================================================
-    # Recursive Search
+    # Regular files (i.e., raw, obj, out, etc.)
     # ==========================================================================
-    if recursive:
-        # If recursive, try to make a dataset out of...
-        # Any file that matches the specified file extension
-        # Regular files
-        if filetype in ATOMIC_FILETYPES:
-            posix_paths = [fpath for fpath in posix_paths if fpath.suffix == f'.{filetype}']
-            # Search explicitly named directories for matching files
-            for dpath in dir_paths:
-                for root, _, files in os.walk(dpath):
-                    matching_files = [
-                        Path(root, fpath) for fpath in files
-                        if fpath.endswith(filetype)
-                    ]
-                    posix_paths.extend(matching_files)
-        # Composite files (e.g., slices)
-        elif filetype in COMPOSITE_FILETYPES:
-            slice_directories = []
-            # Gather directories
-            for dpath in dir_paths:
-                # Explicitly named directories
-                if is_slice_directory(dpath):
-                    slice_directories.append(dpath)
-                # Otherwise, check their contents
-                else:
-                    slice_directories.extend(
-                        find_slice_directories(dpath, recursive=recursive),
-                    )
-            posix_paths = [Path(fpath) for fpath in slice_directories]
-        else:
-            raise NotImplementedError(f"'{filetype}' is not a supported filetype.")
+    if filetype in ATOMIC_FILETYPES:
+        # Every match has the requested extension, so it and the metatype it
+        # implies are passed to each dataset rather than inferred from its path
+        metatype = infer_metatype_from_extension(suffix)
+        # Gather explicitly named files
+        for fpath in str_paths:
+            if os.path.splitext(fpath)[1] == suffix:
+                yield Dataset(fpath, metatype, filetype)
+        # Search explicitly named directories for matching files, and their
+        # subdirectories when recursive
+        for dpath in dir_paths:
+            if recursive:
+                for entry in scan_tree(dpath):
+                    if entry.name.endswith(suffix) and entry.is_file():
+                        yield Dataset(entry.path, metatype, filetype)
+            else:
+                with os.scandir(dpath) as it:
+                    for entry in it:
+                        if entry.name.endswith(suffix) and entry.is_file():
+                            yield Dataset(entry.path, metatype, filetype)
     # ==========================================================================
-    # Shallow Search
+    # Composite files (e.g., slices)
     # ==========================================================================
-    else:
-        # If we're just working with atomic file types (i.e., raw, obj, out, etc.),
-        # then just collect all of the top-level files that match the file
-        # extension, and then search each provided directory's contents for
-        # files that match as well
-        # Gather explicitly named files
-        # Regular files
-        if filetype in ATOMIC_FILETYPES:
-            posix_paths = [Path(fpath) for fpath in posix_paths if fpath.suffix == f'.{filetype}']
-            # Search explicitly named directories for matching files
-            for dpath in dir_paths:
-                matching_files = [
-                    Path(dpath, fpath) for fpath in os.listdir(dpath)
-                    if fpath.endswith(filetype)
-                ]
-                posix_paths.extend(matching_files)
-        # Composite files (e.g., slices)
-        elif filetype in COMPOSITE_FILETYPES:
-            slice_directories = []
-            # Gather directories
-            for dpath in dir_paths:
+    elif filetype in COMPOSITE_FILETYPES:
+        # Overlapping directories (e.g., 'a' and 'a/b') find the same slices
+        seen: set[str] = set()
+        # Probing and classifying directories mostly waits on the file system
+        # (classifying reads a few slices), so do several at once
+        with ThreadPoolExecutor(max_workers=MAX_SCAN_WORKERS) as executor:
+            probes = executor.map(is_slice_directory, dir_paths)
+            for dpath, has_slices in zip(dir_paths, probes):
                 # Explicitly named directories
-                if is_slice_directory(dpath):
-                    slice_directories.append(Path(dpath))
+                if has_slices:
+                    slice_directories = [dpath]
                 # Otherwise, check their contents
                 else:
-                    slice_directories.extend(
-                        find_slice_directories(dpath, recursive=recursive),
-                    )
-                    slice_directories = [Path(fpath) for fpath in slice_directories]
-            posix_paths = [Path(fpath) for fpath in slice_directories]
-        else:
-            raise NotImplementedError
-
-    datasets = [Dataset(path) for path in posix_paths]
+                    slice_directories = find_slice_directories(dpath, recursive=recursive)
+                slice_directories = [fpath for fpath in slice_directories if fpath not in seen]
+                seen.update(slice_directories)
+                yield from filter(None, executor.map(_slice_dataset, slice_directories))
+    else:
+        raise NotImplementedError(f"'{filetype}' is not a supported filetype.")
 
     # for path in paths:
     #     fpath: str = str(path)
@@ -249,4 +262,11 @@ def collect_datasets(*paths: FilePath, filetype: str, recursive: bool = False) -
     #             dataset_files = [Dataset(f, file2metatype(f), filetype) for f in target_files]
     #             datasets.extend(dataset_files)
 
-    return datasets
+
+def _slice_dataset(path: str) -> Dataset | None:
+    """Dataset for a slice directory, or None if its slices are in an unsupported format"""
+    try:
+        return Dataset(path)
+    except UnknownFiletypeError as e:
+        logging.warning(f"Skipping '{path}': {e}")
+        return None
@@ -50,30 +50,37 @@ import numpy as np
 from PIL import Image
 
 
+# Boxes that spell "TEST", as (i0, i1, j0, j1, k0, k1) bounds
+_LETTER_BOXES = (
+    # T
+    (100, 150, 0, 10, 115, 135),
+    (120, 130, 10, 60, 115, 135),
+    # E
+    (100, 150, 60, 70, 115, 135),
+    (100, 110, 70, 80, 115, 135),
+    (100, 140, 80, 90, 115, 135),
+    (100, 110, 90, 100, 115, 135),
+    (100, 150, 100, 110, 115, 135),
+    # S
+    (100, 150, 110, 120, 115, 135),
+    (100, 110, 120, 130, 115, 135),
+    (100, 150, 130, 140, 115, 135),
+    (140, 150, 140, 150, 115, 135),
+    (100, 150, 150, 160, 115, 135),
+    # T
+    (100, 150, 160, 170, 115, 135),
+    (120, 130, 170, 220, 115, 135),
+)
+
+
 def generate_volume(args):
     # First slice
     i, j, k = [250, 250, 250]
     t = (2**16) - 1
     data = np.zeros(shape=(i, j, k), dtype=np.uint16)
 
-    # T
-    data[100:150, 0:10, 115:135] = t
-    data[120:130, 10:60, 115:135] = t
-    # E
-    data[100:150, 60:70, 115:135] = t
-    data[100:110, 70:80, 115:135] = t
-    data[100:140, 80:90, 115:135] = t
-    data[100:110, 90:100, 115:135] = t
-    data[100:150, 100:110, 115:135] = t
-    # S
-    data[100:150, 110:120, 115:135] = t
-    data[100:110, 120:130, 115:135] = t
-    data[100:150, 130:140, 115:135] = t
-    data[140:150, 140:150, 115:135] = t
-    data[100:150, 150:160, 115:135] = t
-    # T
-    data[100:150, 160:170, 115:135] = t
-    data[120:130, 170:220, 115:135] = t
+    for i0, i1, j0, j1, k0, k1 in _LETTER_BOXES:
+        data[i0:i1, j0:j1, k0:k1] = t
 
     # rotate to match one of Adam's roots
     data = np.rot90(data, k=1, axes=(1, 0))
@@ -84,13 +91,11 @@ def __process(args, fp):
     with open(fp, 'rb') as ifp:
         img = Image.open(ifp).convert('LA')
     # Convert to numpy array
-    img_xs = np.array(img).astype('float64')
+    img_xs = np.asarray(img, dtype=np.float32)
     logging.debug(img_xs.shape)
-    img.show()
-    print(img_xs)
-    img_xs *= (2**16 - 1) / img_xs.max()
-    img_xs = img_xs.astype('uint16')
-    print(img_xs)
+    # Stretch to the full range of uint16
+    np.multiply(img_xs, np.float32((2**16 - 1) / img_xs.max()), out=img_xs)
+    img_xs = img_xs.astype(np.uint16)
 
     # TODO(tparker): Convert a flat image into a 3-D numpy array that can
     # be converte into a .RAW and write a .DAT
@@ -3,8 +3,13 @@ from __future__ import annotations
 import logging
 import os
 import re
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import compress
 from os import PathLike
-from pathlib import Path
+from typing import Iterator
 from typing import Sequence
 from typing import Union
 
@@ -12,13 +17,43 @@ import numpy as np
 from PIL import Image
 from PIL import UnidentifiedImageError
 
+from rawtools.constants import COMPOSITE_FILETYPES
 from rawtools.constants import KNOWN_FILETYPES_FLAT
 from rawtools.constants import NSI_PROJECT_NAME_PATTERN
 from rawtools.constants import SLICE_FILENAME_TEMPLATE
 from rawtools.constants import SLICE_FILENAME_TEMPLATE_STRICT
 
+try:
+    import tifffile
+except ImportError:  # tifffile is optional; fall back to Pillow
+    tifffile = None  # type: ignore[assignment]
+
 FilePath = Union[str, 'PathLike[str]']
 
+# PNG file signature, followed by the IHDR chunk's length and type
+_PNG_HEADER = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR'
+
+# Upper limit of threads used to scan and classify directories
+MAX_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# File extensions of images in a slice directory
+SLICE_EXTENSIONS = frozenset(f'.{ext.lower()}' for ext in COMPOSITE_FILETYPES)
+
+# File extensions of each metatype that can be inferred from the name alone
+_VOXEL_EXTS = frozenset({'.obj', '.out', '.xyz'})
+_TEXT_EXTS = frozenset({'.dat', '.nsipro', '.csv', '.json'})
+_VOLUME_EXTS = frozenset({'.raw'})
+
+# Patterns used to standardize NSI project names
+_ILLEGAL_CHARACTERS = str.maketrans(dict.fromkeys(':#%{}\\/!$"`', ' '))
+_HYPHEN_RUNS = re.compile(r'[\s-]+')
+_HYPHENS_BY_UNDERSCORE = re.compile(r'-(?=_)|(?<=_)-')
+_NSI_PROJECT_NAME = re.compile(NSI_PROJECT_NAME_PATTERN)
+
+
+class UnknownFiletypeError(ValueError):
+    """Raised when a path's file format is not recognized"""
+
 
 def resolve_real_paths(paths: Sequence[FilePath]) -> list[FilePath]:
     """Resolve real paths for given absolute paths
@@ -32,7 +67,21 @@ def resolve_real_paths(paths: Sequence[FilePath]) -> list[FilePath]:
     # Case: a single path is provided, insert into a new list
     if isinstance(paths, str):
         paths = [paths]
-    return [os.path.realpath(p) for p in paths]
+
+    # Resolve each parent directory once and join the file name back on, unless
+    # the file itself is a link or its name is relative (i.e., '.' or '..')
+    real_dirs: dict[str, str] = {}
+    real_paths: list[FilePath] = []
+    for p in paths:
+        dname, bname = os.path.split(os.fspath(p))
+        if bname in ('', '.', '..') or os.path.islink(p):
+            real_paths.append(os.path.realpath(p))
+            continue
+        real_dir = real_dirs.get(dname)
+        if real_dir is None:
+            real_dir = real_dirs[dname] = os.path.realpath(dname)
+        real_paths.append(os.path.join(real_dir, bname))
+    return real_paths
 
 
 def omit_duplicate_paths(paths: Sequence[FilePath]) -> list[FilePath]:
@@ -47,7 +96,11 @@ def omit_duplicate_paths(paths: Sequence[FilePath]) -> list[FilePath]:
     # Case: a single path is provided, insert into a new list
     if isinstance(paths, str):
         return [paths]
-    return list(set(paths))
+    # Case: nothing to compare
+    if len(paths) < 2:
+        return list(paths)
+    # Keep the first occurrence of each path, in order
+    return list(dict.fromkeys(paths))
 
 
 def omit_inaccessible_files(paths: Sequence[FilePath]) -> list[FilePath]:
@@ -86,10 +139,20 @@ def prune_paths(paths: Sequence[FilePath]) -> list[FilePath]:
     if isinstance(paths, str):
         paths = [paths]
 
-    paths = resolve_real_paths(paths)
-    paths = omit_duplicate_paths(paths)
-    paths = omit_inaccessible_files(paths)
-    return paths
+    # Resolve, deduplicate, and check each path in a single pass
+    seen = set()
+    kept_paths: list[FilePath] = []
+    for p in paths:
+        real_path = os.path.realpath(p)
+        if real_path in seen:
+            continue
+        seen.add(real_path)
+        try:
+            if os.access(real_path, os.R_OK):
+                kept_paths.append(real_path)
+        except PermissionError:
+            logging.error(f"'{real_path}' is inaccessible.")
+    return kept_paths
 
 
 def infer_metatype_from_path(path: FilePath) -> str:
@@ -103,25 +166,41 @@ def infer_metatype_from_path(path: FilePath) -> str:
         path (FilePath): input file path
 
     Raises:
-        Exception: when the file does not have a recognizable file extension
+        UnknownFiletypeError: when the file does not have a recognizable file extension
 
     Returns:
         str: metatype (e.g., volume, voxel, text)
     """
     name, ext = os.path.splitext(os.path.basename(path))
-    if not ext:
-        if os.path.isdir(path) and is_slice_directory(path):
-            return infer_metatype_from_directory(path)
-    else:
-        ext = ext.lower()
-        logging.debug(f'{name=}, {ext=}')
-        if ext in ['.obj', '.out', '.xyz']:
-            return 'voxel'
-        elif ext in ['.dat', '.nsipro', '.csv', '.json']:
-            return 'text'
-        elif ext in ['.raw']:
-            return 'volume'
-    raise Exception("'{ext}' is an unknown file format.")
+    if not ext and os.path.isdir(path) and is_slice_directory(path):
+        return infer_metatype_from_directory(path)
+    logging.debug(f'{name=}, {ext=}')
+    return infer_metatype_from_extension(ext)
+
+
+def infer_metatype_from_extension(ext: str) -> str:
+    """Infer metatype from a file extension alone
+
+    Callers that handle many files of one format can infer it once instead of
+    once per path (see infer_metatype_from_path).
+
+    Args:
+        ext (str): file extension with leading period (e.g., '.raw')
+
+    Raises:
+        UnknownFiletypeError: when the extension does not imply a metatype
+
+    Returns:
+        str: metatype (e.g., volume, voxel, text)
+    """
+    ext = ext.lower()
+    if ext in _VOXEL_EXTS:
+        return 'voxel'
+    elif ext in _TEXT_EXTS:
+        return 'text'
+    elif ext in _VOLUME_EXTS:
+        return 'volume'
+    raise UnknownFiletypeError(f"'{ext}' is an unknown file format.")
 
 
 def infer_filetype_from_path(path: FilePath) -> str:
@@ -131,24 +210,23 @@ def infer_filetype_from_path(path: FilePath) -> str:
         path (FilePath): input file path
 
     Raises:
-        ValueError: when an unsupported file format is specified
+        UnknownFiletypeError: when an unsupported file format is specified
+        ValueError: when the file is a dotfile
 
     Returns:
         str: file extension *without* leading period
     """
     if is_slice_directory(path):
-        candidate_slices = [fpath for fpath in os.listdir(path) if is_slice(Path(path, fpath))]
-        slice_filetypes = {
-            ext for _, ext in
-            [os.path.splitext(fpath) for fpath in candidate_slices]
-        }
+        pattern = _slice_pattern(os.path.basename(os.path.normpath(path)))
+        with os.scandir(path) as it:
+            candidate_slices = [entry.name for entry in it if _is_slice_name(entry.name, pattern) and entry.is_file()]
+        slice_filetypes = {fname.rpartition('.')[2] for fname in candidate_slices}
         if len(slice_filetypes) > 1:
             raise Exception(f"'{slice_filetypes}' slices were found in {path}. Having more than one type of slice in a given directory is ambiguous.")
         elif len(slice_filetypes) < 1:
             raise Exception(f"No valid slices were found in '{path}'")
         else:
             ftype = slice_filetypes.pop()
-            ftype = ftype.rpartition('.')[-1]  # remove leading period
     else:
         bname = os.path.basename(path)
         name, ext = os.path.splitext(bname)
@@ -158,8 +236,8 @@ def infer_filetype_from_path(path: FilePath) -> str:
         _, _, ftype = ext.rpartition('.')
 
     if ftype not in KNOWN_FILETYPES_FLAT:
-        raise ValueError(f"'{ftype}' is not a supported file format.")
-    return ftype
+        raise UnknownFiletypeError(f"'{ftype}' is not a supported file format.")
+    return sys.intern(ftype)
 
 
 def infer_metatype_from_directory(path: FilePath) -> str:
@@ -180,7 +258,9 @@ def infer_metatype_from_directory(path: FilePath) -> str:
         raise NotADirectoryError(path)
 
     prefix = os.path.basename(path)
-    slices = [os.path.join(path, f) for f in os.listdir(path) if f.startswith(prefix) and is_slice(os.path.join(path, f))]
+    pattern = _slice_pattern(prefix)
+    with os.scandir(path) as it:
+        slices = [entry.path for entry in it if entry.name.startswith(prefix) and _is_slice_name(entry.name, pattern) and entry.is_file()]
 
     # Case: no slices were found
     if not slices:
@@ -193,11 +273,18 @@ def infer_metatype_from_directory(path: FilePath) -> str:
 
     nunique_values_per_test_slices = []
     try:
+        # 1-bit PNGs cannot hold more than two values, so when every sample is
+        # one, the first slice with two values settles it
+        binary = all(_png_bit_depth(test_slice) == 1 for test_slice in test_slices)
         for test_slice in test_slices:
-            img = Image.open(test_slice)
-            img_arr = np.asarray(img)
-            nunique = len(np.unique(img_arr))
+            st = os.stat(test_slice)
+            nunique = __count_slice_levels(test_slice, st.st_mtime_ns, st.st_size)
             logging.debug(f'{nunique=}')
+            # Any grayscale slice settles it, so the rest are not decoded
+            if nunique > 2:
+                return 'volume'
+            if binary and nunique == 2:
+                return 'voxel'
             nunique_values_per_test_slices.append(nunique)
     except FileNotFoundError as e:
         logging.error(e)
@@ -207,14 +294,29 @@ def infer_metatype_from_directory(path: FilePath) -> str:
         raise
     else:
         # Edge case: all white/black slices
-        if all([n == 1 for n in nunique_values_per_test_slices]):
+        if all(n == 1 for n in nunique_values_per_test_slices):
             raise Exception(f"Edge case detected. All slices tested contain a single value. Visual inspect sample, '{path}', for invalid data.")
-        elif any([n > 2 for n in nunique_values_per_test_slices]):
-            return 'volume'
-        elif all([n <= 2 for n in nunique_values_per_test_slices]):
-            return 'voxel'
-        else:
-            raise Exception('Edge case detected. Cannot determine type of slices.')
+        # Otherwise, no more than two values were found in any slice
+        return 'voxel'
+
+
+@lru_cache(maxsize=1024)
+def __count_slice_levels(fpath: str, mtime_ns: int, size: int) -> int:
+    """Count the distinct values of a slice, up to 3 (see _count_levels)
+
+    The modification time and size only key the cache, so a slice is decoded
+    again once it changes.
+    """
+    # Uncompressed TIFFs are mapped instead of decoded, so only the parts of
+    # the slice that the count touches are read
+    if tifffile is not None and os.path.splitext(fpath)[1].lower() in ('.tif', '.tiff'):
+        try:
+            return _count_levels(tifffile.memmap(fpath, mode='r'))
+        except ValueError:  # compressed, or not a TIFF after all
+            pass
+    with Image.open(fpath) as img:
+        img_arr = np.asarray(img)
+    return _count_levels(img_arr)
 
 
 def find_slice_directories(path: FilePath, recursive: bool = False) -> list[str]:
@@ -228,20 +330,122 @@ def find_slice_directories(path: FilePath, recursive: bool = False) -> list[str]
     Returns:
         List[FilePath]: a list of all directories that contain at least 1 of their respective slices
     """
-    directories = []
     if recursive:
-        for root, dirs, files in os.walk(path):
-            for dpath in dirs:
-                dpath = os.path.join(root, dpath)
-                if is_slice_directory(dpath):
-                    directories.append(dpath)
-    else:
-        slice_directories = [os.path.join(path, f) for f in os.listdir(path)]
-        slice_directories = [f for f in slice_directories if is_slice_directory(f)]
-        directories.extend(slice_directories)
+        return _walk_slice_directories(path)
+
+    with os.scandir(path) as it:
+        candidates = [entry.path for entry in it if entry.is_dir()]
+
+    # Probing a directory mostly waits on the file system, so probe several
+    # at once
+    if len(candidates) > 1:
+        with ThreadPoolExecutor(max_workers=MAX_SCAN_WORKERS) as executor:
+            return list(compress(candidates, executor.map(_dir_has_slice, candidates)))
+    return list(compress(candidates, map(_dir_has_slice, candidates)))
+
+
+def _walk_slice_directories(path: FilePath) -> list[str]:
+    """Find every slice directory below a directory
+
+    Each directory is listed once, both to check for its slices and to find
+    its subdirectories. The tree is listed one level at a time and the
+    directories of a level are listed concurrently. Like os.walk, symbolic
+    links to directories are checked but not followed, and directories that
+    cannot be read are skipped.
+
+    Args:
+        path (FilePath): root directory
+
+    Returns:
+        list[str]: slice directories, in the order os.walk finds them
+    """
+    root = os.fspath(path)
+    listings: dict[str, tuple[bool, list[tuple[str, bool]]]] = {}
+    # Directories to list, and whether to descend into them
+    level: list[tuple[str, bool]] = [(root, True)]
+    with ThreadPoolExecutor(max_workers=MAX_SCAN_WORKERS) as executor:
+        while level:
+            next_level = []
+            for (dpath, descend), listing in zip(level, executor.map(_scan_directory, [dpath for dpath, _ in level])):
+                listings[dpath] = listing
+                if descend:
+                    next_level.extend(listing[1])
+            level = next_level
+
+    # Visit the directories top-down, each subtree before the next sibling,
+    # as os.walk does
+    directories: list[str] = []
+    stack = [root]
+    while stack:
+        _, subdirectories = listings[stack.pop()]
+        directories.extend(dpath for dpath, _ in subdirectories if listings[dpath][0])
+        stack.extend(reversed([dpath for dpath, descend in subdirectories if descend]))
     return directories
 
 
+def _scan_directory(path: str) -> tuple[bool, list[tuple[str, bool]]]:
+    """List a directory for both its slices and its subdirectories
+
+    Args:
+        path (str): directory
+
+    Returns:
+        tuple[bool, list[tuple[str, bool]]]: True if the directory contains
+            one of its slices, and each subdirectory with whether it can be
+            descended into (i.e., it is not a symbolic link)
+    """
+    prefix = os.path.basename(path)
+    pattern = _slice_pattern(prefix)
+    has_slice = False
+    subdirectories = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    subdirectories.append((entry.path, not entry.is_symlink()))
+                elif not has_slice and entry.name.startswith(prefix) and _is_slice_name(entry.name, pattern) and entry.is_file():
+                    has_slice = True
+    except OSError as e:
+        logging.debug(e)
+    return has_slice, subdirectories
+
+
+def scan_tree(path: FilePath) -> Iterator[os.DirEntry[str]]:
+    """Iterate over every entry below a directory, depth-first
+
+    Uses a stack of open scandir iterators, so each entry's cached file type
+    is reused and no per-directory listing is built. Like os.walk, symbolic
+    links to directories are yielded but not followed, and directories that
+    cannot be read are skipped.
+
+    Args:
+        path (FilePath): root directory
+
+    Yields:
+        os.DirEntry[str]: file or directory within the tree
+    """
+    try:
+        stack = [os.scandir(path)]
+    except OSError as e:
+        logging.debug(e)
+        return
+    try:
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop().close()
+                continue
+            yield entry
+            if entry.is_dir(follow_symlinks=False):
+                try:
+                    stack.append(os.scandir(entry.path))
+                except OSError as e:
+                    logging.debug(e)
+    finally:
+        for it in stack:
+            it.close()
+
+
 def is_slice_directory(path: FilePath) -> bool:
     """Check if a real path represents a slice directory
 
@@ -258,26 +462,44 @@ def is_slice_directory(path: FilePath) -> bool:
     Returns:
         bool: True if filepath is a directory containing image slices
     """
+    try:
+        return _dir_has_slice(path)
     # Case: path is not a directory
-    if not os.path.isdir(path):
+    except (FileNotFoundError, NotADirectoryError):
         logging.debug(f'{path=} is not a directory.')
         return False
 
+
+def _dir_has_slice(path: FilePath) -> bool:
+    """Check if a known directory contains at least one of its slices
+
+    Args:
+        path (FilePath): path to a directory
+
+    Returns:
+        bool: True if the directory contains a slice
+    """
     prefix = os.path.basename(path)
-    contents = [os.path.join(path, f) for f in os.listdir(path) if f.startswith(prefix)]
-    for fpath in contents:
-        if is_slice(fpath):
-            return True
-    else:
-        return False
+    pattern = _slice_pattern(prefix)
+    # Cheapest checks first; stop at the first slice
+    with os.scandir(path) as it:
+        return any(
+            entry.name.startswith(prefix) and _is_slice_name(entry.name, pattern) and entry.is_file()
+            for entry in it
+        )
 
 
-def is_slice(path: FilePath, mode: str | None = 'strict') -> bool:
+def is_slice(path: FilePath, mode: str | None = 'strict', verify: bool = False) -> bool:
     """Check if a file is a slice within a directory
 
+    By default, only the filename is inspected: it must have an image
+    extension and match the slice naming convention. The file is opened only
+    when `verify` is set.
+
     Args:
         path (FilePath): filepath
         strict (bool, optional): prefix of file must exactly match its parent folder. Defaults to True.
+        verify (bool, optional): open the file to confirm that it is a readable image. Defaults to False.
 
     Returns:
         bool: True if path represents a slice with respect to parent folder
@@ -291,23 +513,112 @@ def is_slice(path: FilePath, mode: str | None = 'strict') -> bool:
             ),
         )
 
-    prefix = os.path.basename(os.path.dirname(path))
-    bname = os.path.basename(path)
+    path = os.fspath(path)
+    dname, bname = os.path.split(path)
+    prefix = os.path.basename(dname)
+    # As in the directory scans, a strict match must start with the prefix, so
+    # most other files are turned away before the pattern is tried
+    if mode == 'strict' and not bname.startswith(prefix):
+        return False
+    match = _is_slice_name(bname, _slice_pattern(prefix, mode))
+
+    if match and verify:
+        try:
+            with Image.open(path):
+                pass
+        except UnidentifiedImageError:
+            logging.debug(f"'{path}' is not a support image type and is not considered a slice.")
+            return False
+
+    return match
+
+
+@lru_cache(maxsize=4096)
+def _slice_pattern(prefix: str, mode: str | None = 'strict') -> re.Pattern[str]:
+    """Compiled filename pattern for the slices of a directory
+
+    Args:
+        prefix (str): basename of the slice directory
+        mode (str | None, optional): naming convention (see is_slice). Defaults to 'strict'.
+
+    Returns:
+        re.Pattern[str]: pattern that matches slice filenames
+    """
     if mode == 'strict':
-        pattern = SLICE_FILENAME_TEMPLATE_STRICT.substitute(prefix=prefix)
-    else:
-        pattern = SLICE_FILENAME_TEMPLATE
+        return re.compile(SLICE_FILENAME_TEMPLATE_STRICT.substitute(prefix=prefix))
+    return re.compile(SLICE_FILENAME_TEMPLATE)
 
-    match = re.match(pattern, bname)
 
-    try:
-        _path = str(path)
-        _ = Image.open(_path)
-    except UnidentifiedImageError:
-        logging.debug(f"'{path}' is not a support image type and is not considered a slice.")
+def _is_slice_name(bname: str, pattern: re.Pattern[str]) -> bool:
+    """Check if a filename has an image extension and matches a slice pattern
+
+    Args:
+        bname (str): basename of file
+        pattern (re.Pattern[str]): slice filename pattern (see _slice_pattern)
+
+    Returns:
+        bool: True if the filename is a slice name
+    """
+    if not _has_ext(bname, SLICE_EXTENSIONS):
         return False
+    return pattern.match(bname) is not None
+
+
+def _has_ext(bname: str, extensions: frozenset[str]) -> bool:
+    """Check if a filename has one of the given extensions, ignoring case
+
+    Only the text after the last period is compared, so 'foo.jpng' does not
+    have the extension '.png'. As with os.path.splitext, leading periods
+    (e.g., '.png') are part of the name, not an extension.
+
+    Args:
+        bname (str): basename of file
+        extensions (frozenset[str]): lowercase extensions with leading period
+
+    Returns:
+        bool: True if the filename has one of the extensions
+    """
+    name, dot, ext = bname.rpartition('.')
+    return bool(name.lstrip('.')) and dot + ext.lower() in extensions
+
 
-    return bool(match)
+def _png_bit_depth(fpath: str) -> int | None:
+    """Read the bit-depth of a PNG from its header, without decoding it
+
+    Args:
+        fpath (str): path to image
+
+    Returns:
+        int | None: bits per sample (or palette index), or None if the file is
+                    not a PNG
+    """
+    with open(fpath, 'rb') as ifp:
+        header = ifp.read(len(_PNG_HEADER) + 9)
+    if len(header) < len(_PNG_HEADER) + 9 or not header.startswith(_PNG_HEADER):
+        return None
+    _, _, bit_depth = struct.unpack_from('>IIB', header, len(_PNG_HEADER))
+    return bit_depth
+
+
+def _count_levels(arr: np.ndarray) -> int:
+    """Count the distinct values of an image, up to 3
+
+    Only whether an image has one, two, or more than two values matters, so
+    this avoids sorting every pixel as np.unique would. A coarse grid of
+    pixels is checked first, since grayscale images almost always show more
+    than two values there.
+
+    Args:
+        arr (np.ndarray): image
+
+    Returns:
+        int: 1 or 2 if the image has that many distinct values; otherwise 3
+    """
+    for sample in (arr[::16, ::16], arr):
+        lo, hi = sample.min(), sample.max()
+        if lo != hi and np.any((sample != lo) & (sample != hi)):
+            return 3
+    return 1 if lo == hi else 2
 
 
 def uid_from_path(path: FilePath) -> str:
@@ -316,15 +627,16 @@ def uid_from_path(path: FilePath) -> str:
 
 def uuid_from_path(path: FilePath) -> str:
     bname = os.path.basename(path)
-    fname, ext = os.path.splitext(bname)
+    # Drop the extension; as with os.path.splitext, leading periods do not
+    # start one
+    fname = bname.rpartition('.')[0]
     # TODO: validate as standard UUID convention
-    return fname
+    return fname if fname.strip('.') else bname
 
 
 def standardize_nsi_project_name(name: str) -> str:
     # Remove illegal characters
-    illegal_characters = r"[:#%{}\\/!\$\"`]"
-    name = re.sub(illegal_characters, ' ', name)
+    name = name.translate(_ILLEGAL_CHARACTERS)
 
     # Trim leading and trailing white space
     name = name.strip()
@@ -333,15 +645,12 @@ def standardize_nsi_project_name(name: str) -> str:
     name = name.replace('&', ' and ')
     name = name.replace('@', ' at ')
 
-    # Replace spaces with hyphens
-    name = re.sub(r'\s+', '-', name)
-
-    # Shorten multiple hyphens to single
-    name = re.sub(r'--+', '-', name)
+    # Replace spaces with hyphens and shorten multiple hyphens to single
+    name = _HYPHEN_RUNS.sub('-', name)
     # Trim hyphens that neighbor and underscore
-    name = re.sub(r'-(?=_)|(?<=_)-', '', name)
+    name = _HYPHENS_BY_UNDERSCORE.sub('', name)
 
-    if not re.match(NSI_PROJECT_NAME_PATTERN, name):
+    if not _NSI_PROJECT_NAME.match(name):
         raise Exception(f"'{name}' is not a recognized naming convention for an NSI project.")
 
     return name
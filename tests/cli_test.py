@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import random
+import shutil
 from textwrap import dedent
 
 import numpy as np
@@ -48,3 +49,58 @@ def test_cli_convert_raw_to_slices(bitdepth, capsys, tmp_path):
     cli.main(args)
     _, err = capsys.readouterr()
     assert err == ''
+
+
+@pytest.mark.parametrize(
+    'options, tiff_compressions', [
+        ([], {8, 32946}),
+        (['--tiff-compression', 'raw'], {1}),
+    ],
+)
+def test_cli_convert_raw_to_stack(options, tiff_compressions, make_volume):
+    tifffile = pytest.importorskip('tifffile')
+    raw_fpath = make_volume(dims=(40, 30, 6))
+    args = ['convert', '-F', 'raw', '-T', 'tif', '-b', 'uint16', '--stack', '--no-log-files', *options, str(raw_fpath)]
+    cli.main(args)
+
+    # A single file instead of a directory of slices
+    assert not raw_fpath.with_suffix('').exists()
+    with tifffile.TiffFile(raw_fpath.with_suffix('.tif')) as tif:
+        assert len(tif.pages) == 6
+        assert all(page.compression in tiff_compressions for page in tif.pages)
+        stack = tif.asarray()
+    np.testing.assert_array_equal(stack, np.fromfile(raw_fpath, dtype='uint16').reshape(stack.shape))
+
+
+def test_cli_convert_raw_to_slices_tiff_compression(make_volume):
+    tifffile = pytest.importorskip('tifffile')
+    raw_fpath = make_volume(dims=(40, 30, 6))
+    args = ['convert', '-F', 'raw', '-T', 'tif', '--tiff-compression', 'tiff_lzw', '--no-log-files', str(raw_fpath)]
+    cli.main(args)
+
+    slice_fpaths = sorted(raw_fpath.with_suffix('').glob('*.tif'))
+    assert len(slice_fpaths) == 6
+    for slice_fpath in slice_fpaths:
+        with tifffile.TiffFile(slice_fpath) as tif:
+            assert tif.pages[0].compression == 5
+
+
+@pytest.mark.parametrize('stack', [False, True])
+def test_cli_convert_compress_level(stack, make_volume, tmp_path):
+    raw_fpath = make_volume(dims=(40, 30, 6))
+    if stack:
+        pytest.importorskip('tifffile')
+    sizes = []
+    for compress_level in ['0', '9']:
+        output_directory = tmp_path / compress_level
+        output_directory.mkdir()
+        target_raw_fpath = output_directory / raw_fpath.name
+        shutil.copy(raw_fpath, target_raw_fpath)
+        shutil.copy(raw_fpath.with_suffix('.dat'), target_raw_fpath.with_suffix('.dat'))
+        args = ['convert', '-F', 'raw', '-T', 'tif' if stack else 'png', '-b', 'uint16', '--compress-level', compress_level, '--no-log-files']
+        if stack:
+            args.append('--stack')
+        cli.main([*args, str(target_raw_fpath)])
+        outputs = [target_raw_fpath.with_suffix('.tif')] if stack else list(target_raw_fpath.with_suffix('').glob('*.png'))
+        sizes.append(sum(fpath.stat().st_size for fpath in outputs))
+    assert sizes[1] < sizes[0]
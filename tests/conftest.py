@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from math import prod
+from textwrap import dedent
+
+import numpy as np
+import pytest
+
+from rawtools.text import dat
+
+
+@pytest.fixture
+def make_volume(tmp_path):
+    """Write a .raw volume and its .dat, and return the filepath of the .raw
+
+    The volume holds increasing values, unless its data is given as a
+    (z, y, x) array.
+    """
+    def _make_volume(bitdepth='uint16', dims=(30, 20, 10), data=None, fname='2020_Universe_Example_100-1'):
+        if data is None:
+            x, y, z = dims
+            data = np.arange(prod(dims)).reshape((z, y, x)).astype(bitdepth)
+        z, y, x = data.shape
+        (tmp_path / f'{fname}.dat').write_text(dedent(f"""\
+        ObjectFileName: {fname}.raw
+        Resolution:     {x} {y} {z}
+        SliceThickness: 0.123456 0.123456 0.123456
+        Format:         {dat.format_from_bitdepth(data.dtype.name)}
+        ObjectModel:    DENSITY
+        """))
+        fpath = tmp_path / f'{fname}.raw'
+        # .raw volumes are little-endian
+        fpath.write_bytes(data.astype(data.dtype.newbyteorder('<')).tobytes())
+        return fpath
+    return _make_volume
@@ -47,6 +47,14 @@ def expected_raw():
     )
 
 
+@pytest.fixture
+def make_raw(make_volume):
+    """Write a small volume of increasing values and its .dat, and read it"""
+    def _make_raw(bitdepth='uint16', dims=(30, 20, 10)):
+        return Raw(make_volume(bitdepth, dims))
+    return _make_raw
+
+
 @pytest.fixture
 def valid_dataset(fs):
     fname = '2023_Universe_test-data_valid'
@@ -314,4 +322,160 @@ def test_raw_to_raw_reshape(input_bitdepth, output_bitdepth, tmp_path):
     assert os.stat(output_fpath).st_size == expected_filesize
 
 
+@pytest.mark.parametrize(
+    'bitdepth', [
+        'uint8', 'uint16', 'float32',
+    ],
+)
+def test_raw_asarray(bitdepth, make_raw):
+    r = make_raw(bitdepth)
+    volume = r.asarray()
+    assert volume.shape == (r.z, r.y, r.x)
+    assert not volume.flags.writeable
+    assert np.array_equal(volume, np.fromfile(r.path, dtype=bitdepth).reshape(volume.shape))
+
+
+@pytest.mark.parametrize(
+    'convert', [
+        lambda r: r.to_slices(ext='png', bitdepth='uint8'),
+        lambda r: r.to_slices(ext='png', bitdepth='uint16'),
+        lambda r: r.to_stack(bitdepth='uint8'),
+        lambda r: r.to_raw(Path(r.path).with_name('out.raw'), bitdepth='uint8'),
+        lambda r: r.to_raw(Path(r.path).with_name('out.raw'), bitdepth='uint8', shape=(15, 10, 5)),
+    ],
+)
+def test_raw_convert_unmaps_volume(convert, make_raw, monkeypatch):
+    mappings = []
+
+    def _map_volume(*args):
+        mapping, volume = map_volume(*args)
+        mappings.append(mapping)
+        return mapping, volume
+    map_volume = raw._map_volume
+    monkeypatch.setattr(raw, '_map_volume', _map_volume)
+
+    convert(make_raw())
+    assert mappings
+    assert all(mapping.closed for mapping in mappings)
+
+
+@pytest.mark.parametrize(
+    'convert', [
+        lambda r: r.asarray(),
+        lambda r: r.to_slices(ext='png', bitdepth='uint8'),
+        lambda r: r.to_stack(bitdepth='uint8'),
+        lambda r: r.to_raw(Path(r.path).with_name('out.raw'), bitdepth='uint8'),
+    ],
+)
+def test_raw_truncated(convert, make_raw):
+    r = make_raw()
+    with open(r.path, 'r+b') as ofp:
+        ofp.truncate(r.expected_filesize - 1)
+    with pytest.raises(ValueError, match='expected to be of size'):
+        convert(r)
+
+
+@pytest.mark.parametrize('progress', [True, False])
+def test_raw_to_slices_progress(progress, make_raw, capsys):
+    r = make_raw()
+    r.to_slices(ext='png', bitdepth='uint8', progress=progress)
+    _, err = capsys.readouterr()
+    assert ('Exporting' in err) == progress
+
+
+@pytest.mark.parametrize('force', [False, True])
+def test_raw_to_slices_skip_existing(force, make_raw):
+    r = make_raw()
+    slices_path = Path(r.path).with_suffix('')
+    r.to_slices(ext='png', bitdepth='uint8')
+    slice_fpath, empty_fpath = sorted(slices_path.glob('*.png'))[:2]
+    slice_fpath.write_bytes(b'stale')
+    empty_fpath.write_bytes(b'')
+
+    r.to_slices(ext='png', bitdepth='uint8', force=force)
+
+    assert (slice_fpath.read_bytes() == b'stale') != force
+    # Empty slices are never reused
+    assert empty_fpath.stat().st_size > 0
+    assert len(os.listdir(slices_path)) == r.z
+
+
+def test_raw_to_slices_skip_existing_float(make_raw):
+    r = make_raw('float32')
+    slices_path = Path(r.path).with_suffix('')
+    # Floating-point slices are saved as TIFFs, even when PNGs are requested
+    r.to_slices(ext='png', bitdepth='float32')
+    slice_fpath = sorted(slices_path.iterdir())[0]
+    assert slice_fpath.suffix == '.tif'
+    slice_fpath.write_bytes(b'stale')
+
+    r.to_slices(ext='png', bitdepth='float32')
+
+    assert slice_fpath.read_bytes() == b'stale'
+    assert len(os.listdir(slices_path)) == r.z
+
+
+def test_raw_to_slices_skip_existing_after_source_changes(make_raw):
+    r = make_raw()
+    slices_path = Path(r.path).with_suffix('')
+    r.to_slices(ext='png', bitdepth='uint8')
+    slice_fpath = sorted(slices_path.glob('*.png'))[0]
+    slice_fpath.write_bytes(b'stale')
+    # The volume is now newer than its slices
+    mtime_ns = slice_fpath.stat().st_mtime_ns + 10**9
+    os.utime(r.path, ns=(mtime_ns, mtime_ns))
+
+    r.to_slices(ext='png', bitdepth='uint8')
+
+    assert slice_fpath.read_bytes() != b'stale'
+
+
+@pytest.mark.parametrize(
+    'compression, tiff_compressions', [
+        ('raw', {1}),
+        ('tiff_adobe_deflate', {8, 32946}),
+        # Not supported for stacks; written with deflate instead
+        ('tiff_lzw', {8, 32946}),
+    ],
+)
+@pytest.mark.parametrize('bitdepth', ['uint8', 'uint16'])
+def test_raw_to_stack(bitdepth, compression, tiff_compressions, make_raw):
+    tifffile = pytest.importorskip('tifffile')
+    from PIL import Image
+    r = make_raw(dims=(30, 20, 10))
+    r.to_slices(ext='png', bitdepth=bitdepth)
+    r.to_stack(bitdepth=bitdepth, compression=compression, threads=3)
+
+    stack_fpath = Path(r.path).with_suffix('.tif')
+    slices = []
+    for slice_fpath in sorted(Path(r.path).with_suffix('').glob('*.png')):
+        with Image.open(slice_fpath) as image:
+            slices.append(np.asarray(image))
+    with tifffile.TiffFile(stack_fpath) as tif:
+        assert len(tif.pages) == r.z
+        assert all(page.compression in tiff_compressions for page in tif.pages)
+        stack = tif.asarray()
+    assert stack.dtype == np.dtype(bitdepth)
+    np.testing.assert_array_equal(stack, np.stack(slices))
+
+
+@pytest.mark.parametrize('force', [False, True])
+def test_raw_to_stack_skip_existing(force, make_raw):
+    pytest.importorskip('tifffile')
+    r = make_raw()
+    stack_fpath = Path(r.path).with_suffix('.tif')
+    stack_fpath.write_bytes(b'stale')
+
+    r.to_stack(bitdepth='uint8', force=force)
+
+    assert (stack_fpath.read_bytes() == b'stale') != force
+
+
+def test_raw_to_stack_without_tifffile(make_raw, monkeypatch):
+    monkeypatch.setattr(raw, 'tifffile', None)
+    r = make_raw()
+    with pytest.raises(ImportError, match="requires 'tifffile'"):
+        r.to_stack(bitdepth='uint8')
+    assert not Path(r.path).with_suffix('.tif').exists()
+
 # TODO: check if changing the output_directory for to_slices() works as intended
@@ -1,6 +1,9 @@
 """Tests for `rawtools` package."""
 from __future__ import annotations
 
+import errno
+import os
+
 import numpy as np
 import pytest
 from numpy import uint16
@@ -76,3 +79,239 @@ def test_scale_uint16_to_uint8_large_variance(slice_uint16_high_variance):
         ),
     )
     np.testing.assert_array_equal(scaled_slice, slice_uint8)
+
+
+@pytest.mark.parametrize('kernels', [True, False], ids=['kernels', 'numpy'])
+@pytest.mark.parametrize(
+    ('input_bitdepth', 'output_bitdepth'), [
+        ('uint8', 'uint16'),
+        ('uint16', 'uint8'),
+        ('uint8', 'float32'),
+        ('uint16', 'float32'),
+        ('float32', 'uint8'),
+        ('float32', 'uint16'),
+    ],
+)
+def test_scale_slice_matches_scale(input_bitdepth, output_bitdepth, kernels, monkeypatch):
+    """Test that scaling a slice gives the same values as flooring the linear
+    scale, including the bounds of the input range.
+    """
+    from rawtools.convert import scale
+    from rawtools.convert.image import utils
+    if not kernels:
+        monkeypatch.setattr(utils, '_kernels', None)
+    elif utils._kernels is None:
+        pytest.skip('numba is not installed')
+
+    # Every integer value, or a spread of floating-point values
+    if np.issubdtype(np.dtype(input_bitdepth), np.integer):
+        info = np.iinfo(input_bitdepth)
+        xs = np.arange(info.min, info.max + 1, dtype=input_bitdepth)
+        old_bounds = (info.min, info.max)
+    else:
+        xs = np.random.default_rng(0).uniform(-500, 3000, 100_000).astype(input_bitdepth)
+        old_bounds = (np.min(xs), np.max(xs))
+    if np.issubdtype(np.dtype(output_bitdepth), np.integer):
+        new_bounds = (np.iinfo(output_bitdepth).min, np.iinfo(output_bitdepth).max)
+    else:
+        new_bounds = (float(np.finfo(output_bitdepth).min), float(np.finfo(output_bitdepth).max))
+    xs = xs.reshape((1, -1))
+
+    expected = np.floor(scale(xs, *old_bounds, *new_bounds)).astype(output_bitdepth)
+    scaled_slice = utils.scale_slice(xs, xs.shape[1], 1, output_bitdepth, old_bounds, new_bounds)
+    assert scaled_slice.dtype == np.dtype(output_bitdepth)
+    np.testing.assert_array_equal(scaled_slice, expected)
+    assert scaled_slice.min() == new_bounds[0]
+    assert scaled_slice.max() == new_bounds[1]
+
+
+def test_scale_slice_uint16_to_float32_does_not_saturate():
+    """Test that mid-range values stay finite and unsaturated when widening to
+    float32's range.
+    """
+    from rawtools.convert.image.utils import scale_slice
+    info = np.finfo('float32')
+    xs = np.array([[0, 32767, 40000, 65535]], dtype=uint16)
+    scaled_slice = scale_slice(xs, 4, 1, 'float32', (0, 65535), (float(info.min), float(info.max)))
+    assert np.all(np.isfinite(scaled_slice))
+    np.testing.assert_allclose(scaled_slice[0, 2], 7.5e37, rtol=1e-2)
+    assert info.min < scaled_slice[0, 1] < scaled_slice[0, 2] < info.max
+
+
+@pytest.mark.parametrize(
+    ('input_bitdepth', 'output_bitdepth', 'expected'), [
+        ('uint16', 'uint8', lambda xs: xs // 257),
+        ('uint8', 'uint16', lambda xs: xs.astype(uint16) * 257),
+    ],
+)
+def test_scale_slice_integer_fast_path(input_bitdepth, output_bitdepth, expected, monkeypatch):
+    """Test that scaling between full unsigned integer ranges is done in
+    integer arithmetic, with the same values as flooring the linear scale.
+    """
+    from rawtools.convert import scale
+    from rawtools.convert.image import utils
+
+    def _scaling_dtype(dtype):
+        raise AssertionError('integer scaling should not compute in floating-point')
+    monkeypatch.setattr(utils, 'scaling_dtype', _scaling_dtype)
+
+    info = np.iinfo(input_bitdepth)
+    xs = np.arange(info.min, info.max + 1, dtype=input_bitdepth).reshape((1, -1))
+    old_bounds = (info.min, info.max)
+    new_bounds = (np.iinfo(output_bitdepth).min, np.iinfo(output_bitdepth).max)
+    scaled_slice = utils.scale_slice(xs, xs.shape[1], 1, output_bitdepth, old_bounds, new_bounds)
+    assert scaled_slice.dtype == np.dtype(output_bitdepth)
+    np.testing.assert_array_equal(scaled_slice, expected(xs))
+    np.testing.assert_array_equal(scaled_slice, np.floor(scale(xs, *old_bounds, *new_bounds)).astype(output_bitdepth))
+
+
+def test_scale_slice_partial_range_is_not_integer_scaled():
+    """Test that a range narrower than the full integer range is still
+    scaled linearly.
+    """
+    from rawtools.convert.image.utils import scale_slice
+    xs = np.array([[0, 257, 514, 1028]], dtype=uint16)
+    scaled_slice = scale_slice(xs, 4, 1, 'uint8', (0, 1028), (0, 255))
+    np.testing.assert_array_equal(scaled_slice, [[0, 63, 127, 255]])
+
+
+@pytest.mark.parametrize('backend', ['kernels', 'numexpr', 'numpy'])
+def test_quantize_slice(backend, monkeypatch):
+    """Test that each backend quantizes a float32 slice the same as casting
+    the linear scale to unsigned 16-bit, and clips values out of range.
+    """
+    from rawtools.convert import scale
+    from rawtools.convert.image import utils
+    if backend == 'kernels' and utils._kernels is None:
+        pytest.skip('numba is not installed')
+    if backend == 'numexpr' and utils.ne is None:
+        pytest.skip('numexpr is not installed')
+    if backend != 'kernels':
+        monkeypatch.setattr(utils, '_kernels', None)
+    if backend == 'numpy':
+        monkeypatch.setattr(utils, 'ne', None)
+
+    xs = np.random.default_rng(0).uniform(-3.7, 1234.56, (200, 500)).astype(np.float32)
+    data_min, data_max = float(xs.min()), float(xs.max())
+    expected = scale(xs, data_min, data_max, 0, 65535).astype(uint16)
+    quantized_slice = utils.quantize_slice(xs, data_min, data_max)
+    assert quantized_slice.dtype == np.dtype(uint16)
+    np.testing.assert_array_equal(quantized_slice, expected)
+    assert quantized_slice.min() == 0
+    assert quantized_slice.max() == 65535
+
+    # Values outside of the range of the volume are clipped
+    outliers = np.array([[data_min - 100, data_max + 100]], dtype=np.float32)
+    np.testing.assert_array_equal(utils.quantize_slice(outliers, data_min, data_max), [[0, 65535]])
+
+
+@pytest.mark.parametrize('tifffile_installed', [True, False], ids=['tifffile', 'pillow'])
+@pytest.mark.parametrize(
+    ('compression', 'tiff_compressions'), [
+        ('raw', {1}),
+        # tifffile tags deflate with the older code
+        ('tiff_adobe_deflate', {8, 32946}),
+        ('tiff_lzw', {5}),
+    ],
+)
+@pytest.mark.parametrize('bitdepth', ['uint8', 'uint16', 'float32'])
+def test_save_image_tiff(bitdepth, compression, tiff_compressions, tifffile_installed, tmp_path, monkeypatch):
+    """Test that TIFFs round-trip with the requested compression, whether
+    they are written by tifffile or Pillow.
+    """
+    tifffile = pytest.importorskip('tifffile')
+    from PIL import Image
+    from rawtools.convert.image import utils
+    if not tifffile_installed:
+        monkeypatch.setattr(utils, 'tifffile', None)
+    elif utils.tifffile is None:
+        pytest.skip('tifffile is not installed')
+
+    # Only uncompressed and deflate TIFFs are written with tifffile
+    calls = []
+    if utils.tifffile is not None:
+        imwrite = utils.tifffile.imwrite
+        monkeypatch.setattr(utils.tifffile, 'imwrite', lambda *args, **kwargs: calls.append(args) or imwrite(*args, **kwargs))
+
+    slice = np.random.default_rng(0).integers(0, 255, (12, 34)).astype(bitdepth)
+    fpath = tmp_path / 'slice.tif'
+    utils.save_image(fpath, slice, bitdepth, compression=compression)
+    assert bool(calls) == (tifffile_installed and compression in utils.TIFFFILE_COMPRESSIONS)
+    assert [p.name for p in tmp_path.iterdir()] == ['slice.tif']
+
+    with tifffile.TiffFile(fpath) as tif:
+        assert tif.pages[0].compression in tiff_compressions
+    with Image.open(fpath) as image:
+        np.testing.assert_array_equal(np.asarray(image), slice)
+
+
+@pytest.mark.parametrize('bitdepth', ['uint8', 'uint16'])
+def test_save_image_png_compress_level(bitdepth, tmp_path):
+    """Test that PNGs round-trip at any compression level, and that higher
+    levels give smaller files.
+    """
+    from PIL import Image
+    from rawtools.convert.image.utils import save_image
+    # Compressible, but not trivially so
+    slice = np.tile(np.arange(256), (64, 4)).astype(bitdepth)
+    sizes = []
+    for compress_level in [0, 9]:
+        fpath = tmp_path / f'slice_{compress_level}.png'
+        save_image(fpath, slice, bitdepth, compress_level=compress_level)
+        with Image.open(fpath) as image:
+            np.testing.assert_array_equal(np.asarray(image), slice)
+        sizes.append(fpath.stat().st_size)
+    assert sizes[1] < sizes[0]
+
+
+def test_save_image_float_as_png(tmp_path):
+    """Test that a floating-point image is saved as TIFF instead of PNG"""
+    from rawtools.convert.image.utils import save_image
+    slice = np.linspace(-1, 1, 20, dtype=np.float32).reshape(DIMS)
+    save_image(tmp_path / 'slice.png', slice, 'float32')
+    assert [p.name for p in tmp_path.iterdir()] == ['slice.tif']
+
+
+@pytest.mark.skipif(not hasattr(os, 'O_DIRECT'), reason='O_DIRECT is not available')
+@pytest.mark.parametrize('reject_direct_write', [False, True])
+def test_direct_writer(reject_direct_write, tmp_path, monkeypatch):
+    """Test that slices of a size that is not a multiple of the block size
+    round-trip through the staging buffer, padding, and truncation, and that
+    a rejected direct write falls back to buffered output.
+    """
+    from rawtools.convert.image import utils
+    # 18,942 bytes per slice, so slices straddle blocks and buffer flushes
+    slices = np.random.default_rng(0).integers(0, 65535, (5, 123, 77), dtype=uint16)
+    fpath = tmp_path / 'volume.raw'
+    try:
+        ofp = utils.DirectWriter(fpath, buffer_size=3 * utils.DirectWriter.block_size)
+    except OSError as err:
+        if err.errno != errno.EINVAL:
+            raise
+        pytest.skip('O_DIRECT is not supported by the file system')
+
+    if reject_direct_write:
+        write = os.write
+
+        def _write(fd, data):
+            if fd == ofp.fd and ofp.direct:
+                raise OSError(errno.EINVAL, os.strerror(errno.EINVAL))
+            return write(fd, data)
+        monkeypatch.setattr(utils.os, 'write', _write)
+
+    with ofp:
+        for cross_section in slices:
+            ofp.write(cross_section)
+    assert ofp.direct != reject_direct_write
+    assert fpath.stat().st_size == slices.nbytes
+    np.testing.assert_array_equal(np.fromfile(fpath, dtype=uint16).reshape(slices.shape), slices)
+
+
+def test_open_raw_output_existing_file(tmp_path):
+    """Test that output to a file that already has content is appended"""
+    from rawtools.convert.image.utils import open_raw_output
+    fpath = tmp_path / 'volume.raw'
+    fpath.write_bytes(b'head')
+    with open_raw_output(fpath) as ofp:
+        ofp.write(np.arange(3, dtype=uint8))
+    assert fpath.read_bytes() == b'head\x00\x01\x02'
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import logging
+from argparse import Namespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from rawtools.qualitycontrol import qualitycontrol
+
+
+def make_args(tmp_path, **kwargs):
+    options = dict(cwd=str(tmp_path), force=False, verbose=True, bits=8, early_exit=False)
+    options.update(kwargs)
+    return Namespace(**options)
+
+
+@pytest.mark.parametrize(
+    'projection, axis, suffix', [
+        (qualitycontrol.get_top_down_projection, 0, 'top'),
+        (qualitycontrol.get_side_projection, 1, 'side'),
+    ],
+)
+@pytest.mark.parametrize('bits', [8, 16])
+def test_projection_bits(projection, axis, suffix, bits, make_volume, tmp_path):
+    data = np.random.default_rng(0).integers(0, 65535, (70, 12, 17), dtype=np.uint16)
+    fpath = make_volume(data=data)
+
+    projection(make_args(tmp_path, bits=bits), fpath)
+
+    expected = data.max(axis=axis)
+    if bits == 8:
+        expected = (expected >> 8).astype(np.uint8)
+    with Image.open(tmp_path / f'2020_Universe_Example_100-1-projection-{suffix}.png') as image:
+        result = np.asarray(image)
+    assert result.dtype == expected.dtype
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize('saturated', [True, False])
+def test_top_down_projection_early_exit(saturated, make_volume, tmp_path, caplog):
+    data = np.random.default_rng(0).integers(0, 60000, (150, 12, 17), dtype=np.uint16)
+    if saturated:
+        data[10] = 65535
+    fpath = make_volume(data=data)
+
+    with caplog.at_level(logging.DEBUG):
+        qualitycontrol.get_top_down_projection(make_args(tmp_path, bits=16, early_exit=True), fpath)
+
+    # Reading stops after the chunk that saturated the projection
+    assert ('Projection saturated after 64 of 150 slices' in caplog.text) == saturated
+    with Image.open(tmp_path / '2020_Universe_Example_100-1-projection-top.png') as image:
+        np.testing.assert_array_equal(np.asarray(image), data.max(axis=0))
+
+
+def test_has_dat(make_volume, tmp_path, caplog):
+    fpath = make_volume(data=np.zeros((2, 3, 4), dtype=np.uint16))
+    assert qualitycontrol.has_dat(fpath)
+
+    missing_fpath = tmp_path / 'missing.raw'
+    assert not qualitycontrol.has_dat(str(missing_fpath))
+    assert "Missing '.dat' file" in caplog.text
+
+    (tmp_path / 'directory.dat').mkdir()
+    assert not qualitycontrol.has_dat(str(tmp_path / 'directory.raw'))
+    assert "Provided '.dat' is not a file" in caplog.text
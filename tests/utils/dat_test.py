@@ -293,3 +293,97 @@ def test_dat_write_disk_out_of_space(fs):
     model = 'DENSITY'
     with pytest.raises(OSError, match=r'No space left on device'):
         dat.write(fpath, dimensions, thickness, dtype, model)
+
+
+NSI_DAT = textwrap.dedent("""\
+ObjectFileName: 2020_Universe_Examples_filename.raw
+Resolution:     10 11 12
+SliceThickness: 0.123456 0.123456 0.123456
+Format:         USHORT
+ObjectModel:    DENSITY
+""")
+
+
+@pytest.mark.parametrize(
+    ('line', 'format', 'expected'), [
+        ('ObjectFileName: 1887_108um.raw', 'NSI', 'object_filename'),
+        ('Resolution:     1498 1498 1886', 'NSI', 'resolution'),
+        ('SliceThickness: 0.108139 0.108139 0.108139', 'NSI', 'slice_thickness'),
+        ('Format:         USHORT', 'NSI', 'file_format'),
+        ('ObjectModel:    DENSITY', 'NSI', 'model'),
+        ('ObjectFileNam: 1887_108um.raw', 'NSI', None),
+        ('<?xml version="1.0"?>', 'Dragonfly', 'header'),
+        ('<ObjectFileName>1887_108um_quarter.raw</ObjectFileName>', 'Dragonfly', 'object_filename'),
+        ('<Resolution X="374" Y="374" Z="472" T="1" />', 'Dragonfly', 'resolution'),
+        ('<Spacing X="4.325560000000000e-04" Y="4.325560000000000e-04" Z="4.325560000000000e-04" />', 'Dragonfly', 'slice_thickness'),
+        ('<Format>USHORT</Format>', 'Dragonfly', 'file_format'),
+        ('<Unit>Density</Unit>', 'Dragonfly', 'model'),
+        ('<Version>1.000000e+00</Version>', 'Dragonfly', None),
+    ],
+)
+def test_dat_line_pattern(line, format, expected):
+    match = dat._LINE[format].match(line)
+    assert (match.lastgroup if match else None) == expected
+
+
+def test_dat_read_cached(tmp_path):
+    dat_fpath = tmp_path / 'cached.dat'
+    dat_fpath.write_text(NSI_DAT)
+    first = dat.read(dat_fpath)
+    second = dat.read(dat_fpath)
+    assert first == second
+    # Callers get their own copy of the cached entry
+    assert first is not second
+    first.dimensions = (1, 2, 3)
+    assert dat.read(dat_fpath).dimensions == (10, 11, 12)
+
+    # A changed file is parsed again
+    dat_fpath.write_text(NSI_DAT.replace('10 11 12', '100 110 120'))
+    assert dat.read(dat_fpath).dimensions == (100, 110, 120)
+
+
+def test_dat_read_fields(tmp_path):
+    dat_fpath = tmp_path / 'fields.dat'
+    dat_fpath.write_text(NSI_DAT)
+    result = dat.read(dat_fpath, fields={'dimensions'})
+    assert result.dimensions == (10, 11, 12)
+    # Parsing stops once the requested fields are known
+    assert result.format is None
+    assert result.model is None
+
+
+def test_dat_read_fields_missing(tmp_path):
+    dat_fpath = tmp_path / 'partial.dat'
+    # Missing ObjectModel
+    dat_fpath.write_text(NSI_DAT.replace('ObjectModel:    DENSITY\n', ''))
+    result = dat.read(dat_fpath, fields={'dimensions', 'format'})
+    assert result.dimensions == (10, 11, 12)
+    assert result.format == 'USHORT'
+
+    with pytest.raises(ValueError, match=r'Unable to parse.*'):
+        dat.read(dat_fpath)
+    with pytest.raises(ValueError, match=r'Unable to parse.*'):
+        dat.read(dat_fpath, fields={'model'})
+
+
+def test_dat_read_unknown_fields(tmp_path):
+    dat_fpath = tmp_path / 'unknown.dat'
+    dat_fpath.write_text(NSI_DAT)
+    with pytest.raises(ValueError, match=r'Unknown \.DAT field\(s\)'):
+        dat.read(dat_fpath, fields={'dimensions', 'colour'})
+
+
+def test_dat_determine_bitdepth_cached(caplog, tmp_path):
+    fpath = tmp_path / 'corrupt.raw'
+    dims = (10, 11, 12)
+    fpath.write_bytes(bytes(2 * prod(dims) - 1))
+    # Corruption is reported on every call, not only the first
+    for _ in range(2):
+        caplog.clear()
+        assert dat.determine_bit_depth(fpath, dims) == 'uint16'
+        assert 'Detected possible data corruption' in caplog.text
+
+    # A known file size is used instead of the size on disk
+    assert dat.determine_bit_depth(fpath, dims, filesize=4 * prod(dims)) == 'float32'
+    with pytest.raises(Exception, match=r'Unable to determine bit-depth of volume'):
+        dat.determine_bit_depth(fpath, dims, filesize=4 * prod(dims) + 1)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 import stat
 from pathlib import Path
 
@@ -10,6 +11,7 @@ from PIL import Image
 from rawtools.utils.path import find_slice_directories
 from rawtools.utils.path import infer_filetype_from_path
 from rawtools.utils.path import infer_metatype_from_directory
+from rawtools.utils.path import infer_metatype_from_extension
 from rawtools.utils.path import infer_metatype_from_path
 from rawtools.utils.path import is_slice
 from rawtools.utils.path import is_slice_directory
@@ -19,6 +21,7 @@ from rawtools.utils.path import prune_paths
 from rawtools.utils.path import resolve_real_paths
 from rawtools.utils.path import standardize_nsi_project_name
 from rawtools.utils.path import standardize_sample_name
+from rawtools.utils.path import UnknownFiletypeError
 
 
 @pytest.mark.parametrize(
@@ -41,10 +44,27 @@ def test_file2metatype(test_input, expected):
 
 
 def test_file2metatype_error():
-    with pytest.raises(Exception, match=r'.* is an unknown file format.'):
+    with pytest.raises(UnknownFiletypeError, match=r"'\.foo' is an unknown file format."):
         infer_metatype_from_path('./data.foo')
 
 
+@pytest.mark.parametrize(
+    ('test_input', 'expected'), [
+        ('.raw', 'volume'),
+        ('.RAW', 'volume'),  # case insensitive
+        ('.obj', 'voxel'),
+        ('.dat', 'text'),
+    ],
+)
+def test_infer_metatype_from_extension(test_input, expected):
+    assert infer_metatype_from_extension(test_input) == expected
+
+
+def test_infer_metatype_from_extension_error():
+    with pytest.raises(UnknownFiletypeError, match=r"'\.png' is an unknown file format."):
+        infer_metatype_from_extension('.png')
+
+
 @pytest.mark.parametrize(
     ('test_input', 'expected'), [
         ('data.raw', 'raw'),
@@ -66,7 +86,7 @@ def test_infer_filetype_from_path(test_input, expected):
     ],
 )
 def test_infer_filetype_from_path_not_supported(test_input):
-    with pytest.raises(ValueError, match=r'.* is not a supported file format.'):
+    with pytest.raises(UnknownFiletypeError, match=r'.* is not a supported file format.'):
         infer_filetype_from_path(test_input)
 
 
@@ -238,6 +258,24 @@ def test_find_slice_directories_recursive(fs):
     assert not difference
 
 
+def test_find_slice_directories_recursive_order(tmp_path):
+    # Slice directories at two depths in each of two subtrees, so that
+    # finding them level by level would interleave the subtrees
+    im = Image.fromarray(np.arange(16, dtype='uint8').reshape((4, 4)))
+    for dpath in [Path('a', 'b'), Path('a', 'b', 'c'), Path('e', 'f'), Path('e', 'f', 'g')]:
+        (tmp_path / dpath).mkdir(parents=True)
+        im.save(tmp_path / dpath / f'{dpath.name}_0000.png')
+
+    expected = [
+        os.path.join(root, dname)
+        for root, dnames, _ in os.walk(tmp_path)
+        for dname in dnames
+        if is_slice_directory(os.path.join(root, dname))
+    ]
+    assert len(expected) == 4
+    assert find_slice_directories(tmp_path, recursive=True) == expected
+
+
 @pytest.mark.parametrize(
     ('test_input', 'expected'), [
         # Valid case
@@ -310,7 +348,20 @@ def test_is_slice(test_input, expected, fs):
 )
 def test_is_slice_failure_not_an_image(test_input, fs):
     fs.create_file(test_input, contents='foo')
-    assert not is_slice(test_input)
+    assert not is_slice(test_input, verify=True)
+
+
+@pytest.mark.parametrize(
+    ('test_input', 'expected'), [
+        ('data_0000.png', True),
+        ('data_0000.TIF', True),
+        ('data_0000.txt', False),
+        ('data_0000', False),
+    ],
+)
+def test_is_slice_by_filename(test_input, expected, fs):
+    fs.create_file(test_input, contents='foo')
+    assert is_slice(test_input) == expected
 
 
 def test_slice_metatype_from_directory_volume(fs):